@@ -0,0 +1,61 @@
+# Images are loaded from disk once and shared between every sprite that draws them
+
+import threading
+from collections import OrderedDict
+import pygame as pg
+
+IMAGES_DIR = './images'
+# How many scaled copies are kept, enough for every image at several tile sizes
+SCALED_CACHE_SIZE = 64
+
+
+class AssetCache:
+
+    '''
+    Each image file is read and decoded once, then converted to the display's pixel format
+    Scaled copies are kept by (file name, width, height), so every tile of the same size shares one Surface
+    Shared Surfaces must not be drawn on, a sprite that needs to change its image should take a copy
+    Only the most recently used scaled copies are kept, so resizing the window again and again
+    scales each image once for each new size without holding on to every size it has ever been
+    Boards can be prepared on a worker thread while the main thread draws, so the cache is shared under a lock
+    '''
+
+    def __init__(self, images_dir=IMAGES_DIR, max_scaled=SCALED_CACHE_SIZE):
+        self.images_dir = images_dir
+        self.max_scaled = max_scaled
+        self.images = {}
+        self.scaled = OrderedDict()
+        self.lock = threading.RLock()
+
+    def get_image(self, name):
+        with self.lock:
+            if name not in self.images:
+                image = pg.image.load(f'{self.images_dir}/{name}')
+                # Converting needs a display, so images loaded before one is set up are kept as they are
+                if pg.display.get_surface() is not None:
+                    image = image.convert_alpha()
+                self.images[name] = image
+            return self.images[name]
+
+    def get(self, name, w, h):
+        key = (name, w, h)
+        with self.lock:
+            if key in self.scaled:
+                self.scaled.move_to_end(key)
+            else:
+                self.scaled[key] = pg.transform.scale(self.get_image(name), (w, h))
+                if len(self.scaled) > self.max_scaled:
+                    self.scaled.popitem(last=False)
+            return self.scaled[key]
+
+    def clear(self):
+        with self.lock:
+            self.images = {}
+            self.scaled = OrderedDict()
+
+
+ASSETS = AssetCache()
+
+
+def get_sprite(name, w, h):
+    return ASSETS.get(name, w, h)
@@ -0,0 +1,197 @@
+# Solve and check every level in a directory in parallel, level files and packs alike, writing one JSON line per level
+# Usage: python batch_solve.py [levels directory] [--output FILE] [--jobs N] [--time-limit SECONDS]
+#                              [--max-nodes N] [--memory-limit MB] [--force]
+
+import os
+import json
+import time
+import argparse
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from level_library import load_library_level
+from level_pack import LevelPack, is_pack
+from solver import solve_level, MAX_NODES, TIME_LIMIT, SOLVED, UNSOLVABLE
+
+try:
+    import resource
+except ImportError:
+    # Memory limits are only available on Unix, elsewhere levels run without one
+    resource = None
+
+LEVELS_DIR = './levels'
+RESULTS_FILE = 'solve_results.jsonl'
+MEMORY_LIMIT = 1024
+
+# Outcomes a level can have on top of the solver's own
+INVALID = 'invalid'
+OUT_OF_MEMORY = 'out of memory'
+CRASHED = 'crashed'
+
+# Levels handed to the pool for each worker at a time, the most that have to be run again if a worker dies
+LEVELS_PER_WORKER = 2
+
+'''
+Each level is solved in a worker process, the whole pool using every core by default
+A level file is one level, numbered 0, and every level in a pack is solved on its own under its number in the pack
+Timeouts are the solver's own time limit, checked while it searches, so a slow level never holds up a worker
+Results are appended to the output file as each level finishes, so a run that is stopped part way loses nothing
+A level is skipped on a rerun if its file has the same modification time and size as when it was last checked
+If a level appears more than once in the output file, the last line for its file and number is the one that counts
+A worker that dies outright, killed by the OS or crashing in C code, breaks the pool and every level in it
+The levels in flight at the time are run again one at a time, so only the level that killed it is put down as crashed,
+and the rest of the run carries on in a new pool
+'''
+
+
+def limit_memory(memory_limit):
+    # Runs once in each worker process before it takes any levels
+    if resource is not None and memory_limit:
+        limit = memory_limit * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def check_level(path, number, max_nodes, time_limit):
+    start_time = time.perf_counter()
+    stat = os.stat(path)
+    result = {'file': path, 'number': number, 'mtime': stat.st_mtime, 'size': stat.st_size}
+    try:
+        level = load_library_level(path, number)
+        solution = solve_level(level, max_nodes, time_limit)
+    except (OSError, ValueError, KeyError, IndexError, TypeError) as error:
+        # Files that cannot be read as a level are reported rather than stopping the whole run
+        result.update({'status': INVALID, 'solvable': None, 'error': str(error)})
+    except MemoryError:
+        result.update({'status': OUT_OF_MEMORY, 'solvable': None})
+    else:
+        result.update({
+            'status': solution.status,
+            'solvable': True if solution.status == SOLVED else False if solution.status == UNSOLVABLE else None,
+            'solution_length': len(solution.moves) if solution.is_solved() else None,
+            'moves': solution.moves,
+            'nodes': solution.nodes,
+        })
+    result['wall_time'] = round(time.perf_counter() - start_time, 4)
+    return result
+
+
+def get_crash_result(path, number, error):
+    stat = os.stat(path)
+    return {'file': path, 'number': number, 'mtime': stat.st_mtime, 'size': stat.st_size, 'status': CRASHED,
+            'solvable': None, 'error': str(error), 'wall_time': None}
+
+
+def write_result(output, results, result):
+    output.write(json.dumps(result) + '\n')
+    output.flush()
+    results.append(result)
+
+
+def run_pool(tasks, output, results, jobs, max_nodes, time_limit, memory_limit):
+    '''
+    Solves the levels in one pool, handing them out a few at a time, until they are all done or a worker dies
+    Returns the levels that were in flight when a worker died, and the levels never handed out
+    '''
+    tasks = iter(tasks)
+    suspects = []
+    unstarted = []
+    with ProcessPoolExecutor(max_workers=jobs, initializer=limit_memory, initargs=(memory_limit,)) as pool:
+        running = {pool.submit(check_level, path, number, max_nodes, time_limit): (path, number)
+                   for path, number in islice(tasks, jobs * LEVELS_PER_WORKER)}
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                task = running.pop(future)
+                try:
+                    write_result(output, results, future.result())
+                except BrokenProcessPool:
+                    suspects.append(task)
+            # Once the pool is broken, the levels still in it fail straight away and nothing more is handed out
+            if not suspects:
+                for path, number in islice(tasks, len(done)):
+                    try:
+                        running[pool.submit(check_level, path, number, max_nodes, time_limit)] = (path, number)
+                    except BrokenProcessPool:
+                        # The pool broke since the last wait, so this level was never handed out
+                        unstarted.append((path, number))
+                        break
+    return suspects, unstarted + list(tasks)
+
+
+def read_results(results_file):
+    # The latest result for every level already checked, by file and number
+    results = {}
+    if os.path.exists(results_file):
+        with open(results_file) as file:
+            for line in file:
+                if line.strip():
+                    result = json.loads(line)
+                    # Lines written before packs were solved have no number, they are all level files
+                    results[result['file'], result.get('number', 0)] = result
+    return results
+
+
+def is_unchanged(path, result):
+    stat = os.stat(path)
+    return result['mtime'] == stat.st_mtime and result['size'] == stat.st_size
+
+
+def get_level_files(levels_dir):
+    return sorted(os.path.join(levels_dir, name) for name in os.listdir(levels_dir)
+                  if os.path.isfile(os.path.join(levels_dir, name)))
+
+
+def get_tasks(level_files):
+    # The (file, number) of every level to solve, a level file is level 0 and a pack has one for each of its levels
+    tasks = []
+    for path in level_files:
+        if not is_pack(path):
+            tasks.append((path, 0))
+            continue
+        try:
+            with LevelPack(path) as pack:
+                count = len(pack)
+        except OSError:
+            # Reported as a level that cannot be read when the worker tries to open it
+            count = 1
+        tasks.extend((path, number) for number in range(0, count))
+    return tasks
+
+
+def run_batch(levels_dir=LEVELS_DIR, results_file=RESULTS_FILE, jobs=None, max_nodes=MAX_NODES,
+              time_limit=TIME_LIMIT, memory_limit=MEMORY_LIMIT, force=False):
+    previous = {} if force else read_results(results_file)
+    tasks = get_tasks(get_level_files(levels_dir))
+    to_check = [task for task in tasks if task not in previous or not is_unchanged(task[0], previous[task])]
+
+    results = []
+    pending = to_check
+    with open(results_file, 'a') as output:
+        while pending:
+            suspects, pending = run_pool(pending, output, results, jobs or os.cpu_count(), max_nodes, time_limit,
+                                         memory_limit)
+            for path, number in suspects:
+                # Alone in its own pool, a level that breaks it is the one that killed the worker
+                if run_pool([(path, number)], output, results, 1, max_nodes, time_limit, memory_limit)[0]:
+                    write_result(output, results, get_crash_result(path, number, 'worker process died'))
+    return results, len(tasks) - len(to_check)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Solve every PySoko level in a directory in parallel')
+    parser.add_argument('levels_dir', nargs='?', default=LEVELS_DIR, help='directory of level files and packs')
+    parser.add_argument('--output', default=RESULTS_FILE, help='JSON Lines file results are appended to')
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: one per core)')
+    parser.add_argument('--max-nodes', type=int, default=MAX_NODES, help='node budget for each level')
+    parser.add_argument('--time-limit', type=float, default=TIME_LIMIT, help='seconds allowed for each level')
+    parser.add_argument('--memory-limit', type=int, default=MEMORY_LIMIT,
+                        help='megabytes each worker may use, 0 for no limit')
+    parser.add_argument('--force', action='store_true', help='check every level, even unchanged ones')
+    args = parser.parse_args()
+
+    results, skipped = run_batch(args.levels_dir, args.output, args.jobs, args.max_nodes, args.time_limit,
+                                 args.memory_limit, args.force)
+    for result in sorted(results, key=lambda result: (result['file'], result['number'])):
+        level = f"{result['file']} #{result['number'] + 1}" if is_pack(result['file']) else result['file']
+        print(f"{level}: {result['status']} ({result['wall_time']}s)")
+    print(f'{len(results)} levels checked, {skipped} unchanged levels skipped')
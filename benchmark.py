@@ -0,0 +1,159 @@
+# Time the game logic, level loading and rendering hot paths on synthetic levels
+# Usage: python benchmark.py [--sizes 6 25 50 100 200] [--repeat N] [--output FILE]
+# Runs headless through SDL's dummy video driver, so it works without a display
+
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import pygame as pg
+import walk_pygame
+from game_core import Level, GameState
+
+SIZES = (6, 10, 25, 50, 100, 200)
+REPEAT = 3
+RESULTS_FILE = 'benchmark_results.jsonl'
+
+# How many moves, undos and frames are timed for each level size
+MOVES = 200000
+FRAMES = 50
+
+# Roughly one in this many inside cells of a synthetic level is a wall, and one a box on its own goal
+WALL_RATE = 8
+BOX_RATE = 12
+
+'''
+Every level size is timed on the same synthetic level each run, as levels are made from a seed of their size
+Each measurement is the best of several repeats, which is the least affected by other work on the machine
+Results from each run are appended as one JSON line, so runs can be compared over time
+'''
+
+
+def make_level_data(size):
+    # A square room walled in all the way round, with walls, boxes and goals scattered inside
+    rand = random.Random(size)
+    rows = [['#'] * size] + [['#'] + ['.'] * (size - 2) + ['#'] for row in range(0, size - 2)] + [['#'] * size]
+    inside = [(col, row) for row in range(1, size - 1) for col in range(1, size - 1)]
+    rand.shuffle(inside)
+    player = inside.pop()
+    walls = inside[0:len(inside) // WALL_RATE]
+    boxes = inside[len(walls):len(walls) + max(1, len(inside) // BOX_RATE)]
+    for col, row in walls:
+        rows[row][col] = '#'
+    # Boxes start off their goals, a goal is put on the cell next in the shuffled list
+    goals = inside[len(walls) + len(boxes):len(walls) + 2 * len(boxes)]
+    for col, row in goals:
+        rows[row][col] = 'x'
+    return {'map': [''.join(row) for row in rows], 'player_coords': list(player),
+            'box_coords': [list(box) for box in boxes]}
+
+
+def best_time(function, repeat):
+    best = None
+    for attempt in range(0, repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_core(level_data, repeat):
+    level = Level.from_level_data(level_data)
+    rand = random.Random(0)
+    directions = [rand.randrange(4) for move in range(0, MOVES)]
+    state = GameState(level)
+
+    def moves():
+        state.reset()
+        move = state.move
+        for direction in directions:
+            move(direction)
+
+    def undos():
+        # Replays the moves first, untimed, so there is a full history to undo
+        state.reset()
+        for direction in directions:
+            state.move(direction)
+        start = time.perf_counter()
+        undo = state.undo
+        while undo():
+            pass
+        return time.perf_counter() - start
+
+    move_time = best_time(moves, repeat)
+    played = state.move_count
+    undo_time = min(undos() for attempt in range(0, repeat))
+    return {
+        'moves_per_s': MOVES / move_time,
+        'undos_per_s': played / undo_time if undo_time else None,
+        'level_build_ms': best_time(lambda: Level.from_level_data(level_data), repeat) * 1000,
+    }
+
+
+def bench_board(level_data, repeat, screen):
+    board_time = best_time(lambda: walk_pygame.Board(Level.from_level_data(level_data)), repeat)
+    board = walk_pygame.Board(Level.from_level_data(level_data))
+
+    def frames():
+        for frame in range(0, FRAMES):
+            board.draw()
+            screen.blit(board, walk_pygame.BOARD_OFFSET)
+
+    keys = list(walk_pygame.KEY_DIRECTIONS)
+    rand = random.Random(0)
+
+    def keypresses():
+        for frame in range(0, FRAMES):
+            board.events(rand.choice(keys))
+            board.draw_dirty()
+
+    return {
+        'board_build_ms': board_time * 1000,
+        'frame_ms': best_time(frames, repeat) / FRAMES * 1000,
+        'keypress_ms': best_time(keypresses, repeat) / FRAMES * 1000,
+    }
+
+
+def run_benchmarks(sizes=SIZES, repeat=REPEAT):
+    pg.init()
+    screen = pg.display.set_mode(walk_pygame.SCREEN_DIMS)
+    results = []
+    for size in sizes:
+        level_data = make_level_data(size)
+        result = {'size': size}
+        result.update(bench_core(level_data, repeat))
+        result.update(bench_board(level_data, repeat, screen))
+        results.append(result)
+    pg.quit()
+    return {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'pygame': pg.version.ver,
+        'machine': platform.platform(),
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark PySoko on synthetic levels')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help='side lengths of the levels to time')
+    parser.add_argument('--repeat', type=int, default=REPEAT, help='repeats of each measurement, the best is kept')
+    parser.add_argument('--output', default=RESULTS_FILE, help='JSON Lines file the run is appended to')
+    args = parser.parse_args()
+
+    run = run_benchmarks(args.sizes, args.repeat)
+    with open(args.output, 'a') as file:
+        file.write(json.dumps(run) + '\n')
+    for result in run['results']:
+        print(f"{result['size']}x{result['size']}: " + ', '.join(f'{name} {value:.4g}' for name, value in result.items()
+                                                              if name != 'size' and value is not None))
+    print(f'Results appended to {args.output}', file=sys.stderr)
@@ -4,6 +4,9 @@
 import pygame as pg
 import math
 import json
+from assets import get_sprite
+from scenes import Scene, SceneManager
+from level_validator import validate_data
 
 FPS = 30
 
@@ -84,8 +87,7 @@ class Button(GameSprite):
     def __init__(self, x, y, w, h, sprite):
         super().__init__(x, y, w, h)
         self.sprite = sprite
-        self.image = pg.image.load(f'./images/{self.sprite}').convert()
-        self.image = pg.transform.scale(self.image, (w, h))
+        self.image = get_sprite(self.sprite, w, h)
 
 
 class EditButton(Button):
@@ -121,7 +123,7 @@ class EmptySlot(GameSprite):
         self.change_sprite('tile')
 
     def change_sprite(self, sprite):
-        self.image = pg.transform.scale(pg.image.load(f'./images/{sprite}.png').convert(), (self.w, self.h))
+        self.image = get_sprite(f'{sprite}.png', self.w, self.h)
 
     def get_coords(self):
         return self.col, self.row
@@ -226,18 +228,68 @@ class Workspace(GameSprite):
         self.empty_slots_group.draw(self.image)
 
 
-class SaveAs:
+class EditorScene(Scene):
 
-    def __init__(self, editor_screen_img):
-        self.original_bg = editor_screen_img
-        self.screen = pg.display.set_mode(self.original_bg.get_size())
-        self.dark = pg.Surface(self.screen.get_size()).convert_alpha()
-        self.dark.fill(saveas_cnfg['shade'])
+    '''
+    The editor's screens are laid out for a window of edit_cnfg['w'] by edit_cnfg['h']
+    They draw onto a canvas of that size, which is scaled to fit whatever window they are shown in,
+    and mouse positions are scaled back onto the canvas, so the editor works in the game's window as well as its own
+    '''
+
+    canvas_size = (edit_cnfg['w'], edit_cnfg['h'])
+
+    def __init__(self, manager):
+        super().__init__(manager)
+        self.canvas = pg.Surface(self.canvas_size)
+
+    @property
+    def screen(self):
+        # Everything the editor draws goes onto the canvas, present puts it in the window
+        return self.canvas
+
+    def get_view(self):
+        # The largest area of the window the canvas fits in without stretching, centred
+        window = self.manager.screen.get_rect()
+        scale = min(window.w / self.canvas_size[0], window.h / self.canvas_size[1])
+        view = pg.Rect(0, 0, max(1, round(self.canvas_size[0] * scale)), max(1, round(self.canvas_size[1] * scale)))
+        view.center = window.center
+        return view
+
+    def to_canvas(self, event):
+        # Returns the event with its mouse position moved from the window onto the canvas
+        if not hasattr(event, 'pos'):
+            return event
+        view = self.get_view()
+        pos = (int((event.pos[0] - view.x) * self.canvas_size[0] / view.w),
+               int((event.pos[1] - view.y) * self.canvas_size[1] / view.h))
+        return pg.event.Event(event.type, dict(event.__dict__, pos=pos))
+
+    def present(self):
+        window = self.manager.screen
+        view = self.get_view()
+        if view.size == self.canvas_size:
+            window.blit(self.canvas, view)
+        else:
+            window.fill(edit_cnfg['bg_col'])
+            window.blit(pg.transform.smoothscale(self.canvas, view.size), view)
+        pg.display.flip()
 
-        pg.key.set_repeat(500, 25)
 
-        self.clock = pg.time.Clock()
-        self.done = False
+class SaveAs(EditorScene):
+
+    '''
+    Shown on top of the editor, which is drawn darkened behind it
+    The editor reads the name back with get_name once this scene has left
+    '''
+
+    caption = edit_cnfg['title']
+    key_repeat = (500, 25)
+
+    def __init__(self, manager, editor_screen_img):
+        super().__init__(manager)
+        self.original_bg = editor_screen_img
+        self.dark = pg.Surface(self.original_bg.get_size()).convert_alpha()
+        self.dark.fill(saveas_cnfg['shade'])
 
         self.save_name = ''
         self.confirmed = False
@@ -245,8 +297,6 @@ class SaveAs:
 
         self.create_widgets()
 
-        self.mainloop()
-
     def create_widgets(self):
         self.main_box = GameSprite(saveas_cnfg['main_box_x'], saveas_cnfg['main_box_y'],
                                    saveas_cnfg['main_box_w'], saveas_cnfg['main_box_h'])
@@ -277,57 +327,49 @@ class SaveAs:
         if self.confirmed:
             return self.save_name
 
-    def mainloop(self):
-
-        self.clock.tick(FPS)
-
-        while not self.done:
-            for event in pg.event.get():
-                if event.type == pg.QUIT:
-                    self.done = True
-                if event.type == pg.MOUSEBUTTONDOWN:
-                    if event.button == 1:
-                        if self.text_box.rect.collidepoint(event.pos):
-                            self.txt_box_active = True
-                        elif self.confirm_b.rect.collidepoint(event.pos):
-                            if len(self.save_name) > 0:
-                                self.confirmed = True
-                                self.done = True
-                        else:
-                            self.done = True
-                if event.type == pg.KEYDOWN:
-                    if self.txt_box_active:
-                        if event.key == pg.K_BACKSPACE:
-                            self.save_name = self.save_name[:-1]
-                        elif (event.unicode.isalnum() or event.key == pg.K_SPACE) \
-                                and self.save_name_txt.get_width() < saveas_cnfg['name_surf_lim']:
-                            self.save_name += event.unicode
-                        self.save_name_txt = self.font.render(self.save_name, True, WHITE)
-
-            self.draw_all()
-
-            pg.display.flip()
-
-
-class Editor:
-
-    def __init__(self, curr_level_data):
-        pg.init()
-        self.screen = pg.display.set_mode((edit_cnfg['w'], edit_cnfg['h']))
-        self.screen.fill(edit_cnfg['bg_col'])
-        self.clock = pg.time.Clock()
-        pg.display.set_caption(edit_cnfg['title'])
+    def draw(self):
+        self.draw_all()
+
+        self.present()
+
+    def handle_event(self, event):
+        event = self.to_canvas(event)
+        super().handle_event(event)
+        if event.type == pg.MOUSEBUTTONDOWN:
+            if event.button == 1:
+                if self.text_box.rect.collidepoint(event.pos):
+                    self.txt_box_active = True
+                elif self.confirm_b.rect.collidepoint(event.pos):
+                    if len(self.save_name) > 0:
+                        self.confirmed = True
+                        self.manager.pop()
+                else:
+                    self.manager.pop()
+        if event.type == pg.KEYDOWN:
+            if self.txt_box_active:
+                if event.key == pg.K_BACKSPACE:
+                    self.save_name = self.save_name[:-1]
+                elif (event.unicode.isalnum() or event.key == pg.K_SPACE) \
+                        and self.save_name_txt.get_width() < saveas_cnfg['name_surf_lim']:
+                    self.save_name += event.unicode
+                self.save_name_txt = self.font.render(self.save_name, True, WHITE)
+
+
+class Editor(EditorScene):
+
+    caption = edit_cnfg['title']
+
+    def __init__(self, manager, curr_level_data):
+        super().__init__(manager)
         self.curr_level_data = curr_level_data
-        self.done = False
 
         self.exiting_level = True if self.curr_level_data else False
 
         self.selected = None
+        self.save_as = None
 
         self.create_widgets()
 
-        self.mainloop()
-
     def create_widgets(self):
         self.player_b = EditButton(edit_cnfg['b_x'], edit_cnfg['b_left_y'], edit_cnfg['b_sizex'],
                                    edit_cnfg['b_sizey'], 'player', 'player.png')
@@ -370,56 +412,65 @@ class Editor:
     def compile_level(self, name):
         self.level_data = self.workspace.get_slot_data()
         self.level_data['name'] = name
+        # A level that could never be played is not saved, the caption says what is wrong with it instead
+        self.problems = validate_data(self.level_data, name)
+        if self.problems:
+            pg.display.set_caption(f"{edit_cnfg['title']} - not saved: {'; '.join(self.problems)}")
+            return False
         self.file_name = name.replace(' ', '_')
         with open(f'./levels/{self.file_name}.txt', 'w') as file:
             json.dump(self.level_data, file, indent=4)
+        return True
 
     def confirm_write(self):
         self.curr_screen = pg.Surface((self.screen.get_size()))
         self.curr_screen.blit(self.screen, (0, 0))
-        self.save_name = SaveAs(self.curr_screen).get_name()
-        if self.save_name:
-            self.compile_level(self.save_name)
+        self.save_as = SaveAs(self.manager, self.curr_screen)
+        self.manager.push(self.save_as)
+
+    def enter(self):
+        super().enter()
+        # Coming back from Save as, the level is written if a name was confirmed
+        if self.save_as:
+            self.save_name = self.save_as.get_name()
+            self.save_as = None
+            if self.save_name:
+                self.compile_level(self.save_name)
 
     def draw_groups(self):
         self.workspace_group.draw(self.screen)
         self.edit_group.draw(self.screen)
 
-    def mainloop(self):
-
-        while not self.done:
-
-            self.clock.tick(FPS)
-
-            for event in pg.event.get():
-                if event.type == pg.QUIT:
-                    self.done = True
-                if event.type == pg.MOUSEBUTTONDOWN:
-                    if event.button == 1:
-                        self.mouse_point = event.pos
-                        for button in self.edit_group:
-                            if button.rect.collidepoint(self.mouse_point):
-                                self.selected = button.get_paint()
-                        if self.reset_b.rect.collidepoint(self.mouse_point):
-                            self.reset_board()
-                        if self.save_b.rect.collidepoint(self.mouse_point):
-                            # Save writes over the original level file with the same name
-                            self.compile_level('new_lvl')
-                        if self.save_as_b.rect.collidepoint(self.mouse_point):
-                            # Save as will open a window for the user to write a new file name
-                            self.confirm_write()
-                        if self.quit_b.rect.collidepoint(self.mouse_point):
-                            self.done = True
-                        if self.workspace.rect.collidepoint(self.mouse_point) and self.selected:
-                            self.workspace.events(self.mouse_point, self.selected)
-
-            self.screen.fill(edit_cnfg['bg_col'])
-            self.draw_groups()
-
-            pg.display.flip()
-
-        pg.quit()
+    def draw(self):
+        self.screen.fill(edit_cnfg['bg_col'])
+        self.draw_groups()
+
+        self.present()
+
+    def handle_event(self, event):
+        event = self.to_canvas(event)
+        super().handle_event(event)
+        if event.type == pg.MOUSEBUTTONDOWN:
+            if event.button == 1:
+                self.mouse_point = event.pos
+                for button in self.edit_group:
+                    if button.rect.collidepoint(self.mouse_point):
+                        self.selected = button.get_paint()
+                if self.reset_b.rect.collidepoint(self.mouse_point):
+                    self.reset_board()
+                if self.save_b.rect.collidepoint(self.mouse_point):
+                    # Save writes over the original level file with the same name
+                    self.compile_level('new_lvl')
+                if self.save_as_b.rect.collidepoint(self.mouse_point):
+                    # Save as will open a window for the user to write a new file name
+                    self.confirm_write()
+                if self.quit_b.rect.collidepoint(self.mouse_point):
+                    self.manager.pop()
+                if self.workspace.rect.collidepoint(self.mouse_point) and self.selected:
+                    self.workspace.events(self.mouse_point, self.selected)
 
 
 if __name__ == '__main__':
-    win = Editor(None)
+    manager = SceneManager((edit_cnfg['w'], edit_cnfg['h']), fps=FPS)
+    manager.push(Editor(manager, None))
+    manager.run()
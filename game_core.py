@@ -0,0 +1,345 @@
+# The rules of Sokoban without PyGame, so levels can be played by scripts, tests and bots as well as the game
+
+import sys
+import json
+import random
+
+'''
+The game core is split in two:
+- Level holds everything that never changes during play (the cell grid, goals and starting positions)
+- GameState holds the player and box positions, and the moves made so far
+Cells are referred to by a flat index into the grid, (column, row) coordinates are only used at the edges
+'''
+
+# Cell types, keyed by the characters used in level maps
+VOID = 0
+FLOOR = 1
+GOAL = 2
+WALL = 3
+CELL_TYPES = {'0': VOID, '.': FLOOR, 'x': GOAL, '#': WALL}
+# Tables for bytes.translate, turning a grid of cell types into 1 where a cell is walkable or a goal
+WALKABLE_CELLS = bytes(1 if cell in (FLOOR, GOAL) else 0 for cell in range(0, 256))
+GOAL_CELLS = bytes(1 if cell == GOAL else 0 for cell in range(0, 256))
+
+# Directions in LURD order, the order used by Sokoban move strings
+LEFT = 0
+UP = 1
+RIGHT = 2
+DOWN = 3
+DIRECTIONS = 'lurd'
+VECTORS = ((-1, 0), (0, -1), (1, 0), (0, 1))
+
+# Pull distance of a cell no box can be pulled to
+UNREACHABLE = -1
+
+# Results of a move, undo or redo
+BLOCKED = 0
+MOVED = 1
+PUSHED = 2
+
+# The move log is stored one byte per move, lower case for a step and upper case for a push (LURD notation)
+STEP_CODES = b'lurd'
+PUSH_CODES = b'LURD'
+# Direction of each move log byte, indexed by the byte itself
+CODE_DIRECTIONS = bytes(STEP_CODES.find(code | 0x20) % 4 for code in range(0, 128))
+
+# Zobrist keys are drawn from a fixed seed, so a position hashes the same way every time the level is loaded
+ZOBRIST_SEED = 'PySoko'
+
+
+def check_on_grid(item, coords, cols, rows):
+    # Cells are found from coordinates with no checking, one off the grid would wrap onto the next row or off the board
+    col, row = coords
+    if not (0 <= col < cols and 0 <= row < rows):
+        raise ValueError(f'{item} at {tuple(coords)} is off the {cols}x{rows} grid')
+
+
+class Level:
+
+    '''
+    The grid is padded with a ring of void cells, so a move can never step off the edge of the board
+    This means moves never need a bounds check, only a look up of the cell being moved into
+    '''
+
+    def __init__(self, cols, rows, cells, player_coords, box_coords, name='', dead=None):
+        self.name = name
+        self.cols = cols
+        self.rows = rows
+        # Width of a padded row, moving one row up or down is a step of this many cells
+        self.width = cols + 2
+        self.size = self.width * (rows + 2)
+        self.steps = (-1, -self.width, 1, self.width)
+
+        self.cells = bytearray(self.size)
+        for row in range(0, rows):
+            start = self.index(0, row)
+            self.cells[start:start + cols] = cells[row * cols:(row + 1) * cols]
+        self.walkable = bytes(self.cells).translate(WALKABLE_CELLS)
+        self.goals = bytes(self.cells).translate(GOAL_CELLS)
+        self.goal_cells = tuple(i for i in range(0, self.size) if self.goals[i])
+
+        check_on_grid('player', player_coords, cols, rows)
+        for coords in box_coords:
+            check_on_grid('box', coords, cols, rows)
+        self.player_start = self.index(*player_coords)
+        self.box_starts = tuple(self.index(*coords) for coords in box_coords)
+        # Boxes beyond the number of goals, these can be left anywhere without losing the level
+        self.spare_boxes = len(self.box_starts) - len(self.goal_cells)
+        # Dead cells only depend on the grid, so a level compiled before can pass them in instead of searching
+        self.dead = bytes(dead) if dead is not None else self.find_dead_cells()
+
+        # A random 64 bit key for a box and for the player on each cell, XORed together to hash a position
+        keys = random.Random(ZOBRIST_SEED)
+        self.box_keys = tuple(keys.getrandbits(64) for i in range(0, self.size))
+        self.player_keys = tuple(keys.getrandbits(64) for i in range(0, self.size))
+
+    def find_pull_distances(self, sources):
+        '''
+        Pulls boxes backwards from the source cells, ignoring any other boxes
+        A box can be pulled one step if the player has room to stand behind it while pulling
+        The number of pulls to reach a cell is the fewest pushes to get a box from it onto one of the sources
+        '''
+        pulls = [UNREACHABLE] * self.size
+        frontier = list(sources)
+        for cell in frontier:
+            pulls[cell] = 0
+        for cell in frontier:
+            for step in self.steps:
+                if self.walkable[cell + step] and self.walkable[cell + 2 * step] and pulls[cell + step] == UNREACHABLE:
+                    pulls[cell + step] = pulls[cell] + 1
+                    frontier.append(cell + step)
+        return pulls
+
+    def find_dead_cells(self):
+        '''
+        A dead cell is a floor cell a box can never be pushed from onto any goal, such as a corner
+        Pulling boxes backwards from every goal finds all the cells a box could have been pushed from,
+        every walkable cell that is never reached by a pull is dead
+        '''
+        pulls = self.find_pull_distances(self.goal_cells)
+        return bytes(1 if self.walkable[i] and pulls[i] == UNREACHABLE else 0 for i in range(0, self.size))
+
+    def find_region(self, boxes, player):
+        '''
+        Flood fills the cells the player can walk to without pushing, boxes holds a 1 for each cell with a box
+        Returns the cells reached as a bytearray of 1s, and as a list in the order they were reached
+        '''
+        seen = bytearray(self.size)
+        seen[player] = 1
+        reachable = [player]
+        for cell in reachable:
+            for step in self.steps:
+                near = cell + step
+                if self.walkable[near] and not boxes[near] and not seen[near]:
+                    seen[near] = 1
+                    reachable.append(near)
+        return seen, reachable
+
+    def is_dead(self, cell):
+        return self.dead[cell] == 1
+
+    @classmethod
+    def from_map(cls, level_map, player_coords, box_coords, name=''):
+        # Rows shorter than the widest row are padded with void cells
+        cols = max(len(row) for row in level_map)
+        cells = bytearray(cols * len(level_map))
+        for row, line in enumerate(level_map):
+            for col, item in enumerate(line):
+                cells[row * cols + col] = CELL_TYPES.get(item, VOID)
+        return cls(cols, len(level_map), cells, player_coords, box_coords, name)
+
+    @classmethod
+    def from_level_data(cls, level_data, name=''):
+        return cls.from_map(level_data['map'], level_data['player_coords'], level_data['box_coords'], name)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as file:
+            return cls.from_level_data(json.load(file), path)
+
+    def index(self, col, row):
+        return (row + 1) * self.width + col + 1
+
+    def coords(self, index):
+        return index % self.width - 1, index // self.width - 1
+
+    def get_cell(self, col, row):
+        if not (0 <= col < self.cols and 0 <= row < self.rows):
+            return VOID
+        return self.cells[self.index(col, row)]
+
+
+class GameState:
+
+    '''
+    Boxes are kept in an occupancy array the size of the grid, and the number of covered goals is counted
+    Moving, undoing and checking for a win all take the same time however large the level is
+    Boxes on dead cells are counted the same way, so a lost level is noticed straight away
+
+    The Zobrist hash of the boxes is updated with two XORs on every push
+    Positions where the player can walk between each other without pushing are the same position,
+    so the player is hashed by the lowest cell of the region they can reach (the normalized player)
+    The region can only change when a box moves, so it is found again lazily after a push
+    '''
+
+    def __init__(self, level):
+        self.level = level
+        # Kept on the state as well as the level, as these are read on every move
+        self.steps = level.steps
+        self.walkable = level.walkable
+        self.goals = level.goals
+        self.goal_count = len(level.goal_cells)
+        self.box_keys = level.box_keys
+        self.dead = level.dead
+        self.reset()
+
+    def reset(self):
+        self.player = self.level.player_start
+        self.boxes = bytearray(self.level.size)
+        self.goals_covered = 0
+        self.dead_boxes = 0
+        self.box_hash = 0
+        for box in self.level.box_starts:
+            self.boxes[box] = 1
+            self.goals_covered += self.goals[box]
+            self.dead_boxes += self.dead[box]
+            self.box_hash ^= self.box_keys[box]
+        self.region_cell = None
+        self.clear_history()
+
+    def clear_history(self):
+        '''
+        The move log is a bytearray that is only ever overwritten or appended to, never sliced or copied
+        move_count is how many moves are currently played, history_end is how far redo can go
+        Making a new move after an undo overwrites the log in place and pulls history_end back to it
+        '''
+        self.history = bytearray()
+        self.move_count = 0
+        self.history_end = 0
+
+    def record(self, code):
+        if self.move_count < len(self.history):
+            self.history[self.move_count] = code
+        else:
+            self.history.append(code)
+        self.move_count += 1
+        self.history_end = self.move_count
+
+    def move(self, direction):
+        step = self.steps[direction]
+        target = self.player + step
+        if not self.walkable[target]:
+            return BLOCKED
+        boxes = self.boxes
+        if boxes[target]:
+            beyond = target + step
+            if boxes[beyond] or not self.walkable[beyond]:
+                return BLOCKED
+            boxes[target] = 0
+            boxes[beyond] = 1
+            self.goals_covered += self.goals[beyond] - self.goals[target]
+            self.dead_boxes += self.dead[beyond] - self.dead[target]
+            self.box_hash ^= self.box_keys[target] ^ self.box_keys[beyond]
+            self.region_cell = None
+            self.record(PUSH_CODES[direction])
+            self.player = target
+            return PUSHED
+        self.record(STEP_CODES[direction])
+        self.player = target
+        return MOVED
+
+    def undo(self):
+        '''
+        If the previous move was valid, then the reverse of that move will be valid
+        This means no extra positional checks are needed to undo a move
+        '''
+        if not self.move_count:
+            return BLOCKED
+        self.move_count -= 1
+        code = self.history[self.move_count]
+        step = self.steps[CODE_DIRECTIONS[code]]
+        if code in PUSH_CODES:
+            box = self.player + step
+            self.boxes[box] = 0
+            self.boxes[self.player] = 1
+            self.goals_covered += self.goals[self.player] - self.goals[box]
+            self.dead_boxes += self.dead[self.player] - self.dead[box]
+            self.box_hash ^= self.box_keys[box] ^ self.box_keys[self.player]
+            self.region_cell = None
+            self.player -= step
+            return PUSHED
+        self.player -= step
+        return MOVED
+
+    def redo(self):
+        # Replays the next undone move, it was valid when it was made so it is still valid now
+        if self.move_count == self.history_end:
+            return BLOCKED
+        code = self.history[self.move_count]
+        self.move_count += 1
+        step = self.steps[CODE_DIRECTIONS[code]]
+        self.player += step
+        if code in PUSH_CODES:
+            beyond = self.player + step
+            self.boxes[self.player] = 0
+            self.boxes[beyond] = 1
+            self.goals_covered += self.goals[beyond] - self.goals[self.player]
+            self.dead_boxes += self.dead[beyond] - self.dead[self.player]
+            self.box_hash ^= self.box_keys[self.player] ^ self.box_keys[beyond]
+            self.region_cell = None
+            return PUSHED
+        return MOVED
+
+    def get_reachable(self):
+        # Every cell the player can walk to without pushing a box, found with a flood fill
+        return self.level.find_region(self.boxes, self.player)[1]
+
+    def get_region_cell(self):
+        if self.region_cell is None:
+            self.region_cell = min(self.get_reachable())
+        return self.region_cell
+
+    def get_hash(self):
+        # Hash of the exact position, the player's own cell included
+        return self.box_hash ^ self.level.player_keys[self.player]
+
+    def get_state_hash(self):
+        # Hash of the position up to where the player stands inside the region they can walk around
+        return self.box_hash ^ self.level.player_keys[self.get_region_cell()]
+
+    def get_moves(self):
+        # The moves currently played as a LURD move string
+        return self.history[0:self.move_count].decode()
+
+    def replay(self, moves):
+        # Plays a move string such as 'lluRd', returns False as soon as a move is blocked
+        for char in moves:
+            if not self.move(DIRECTIONS.index(char.lower())):
+                return False
+        return True
+
+    def is_won(self):
+        return self.goals_covered == self.goal_count
+
+    def is_lost(self):
+        # The level can no longer be won once more boxes are stuck on dead cells than there are spare boxes
+        return self.dead_boxes > self.level.spare_boxes
+
+    def is_dead_push(self, direction):
+        # Whether moving in this direction would push a box onto a dead cell
+        target = self.player + self.steps[direction]
+        return self.boxes[target] == 1 and self.dead[target + self.steps[direction]] == 1
+
+    def get_player_coords(self):
+        return self.level.coords(self.player)
+
+    def get_box_coords(self):
+        return [self.level.coords(i) for i in range(0, self.level.size) if self.boxes[i]]
+
+
+if __name__ == '__main__':
+    # Usage: python game_core.py <level file> <moves>
+    state = GameState(Level.load(sys.argv[1]))
+    legal = state.replay(sys.argv[2] if len(sys.argv) > 2 else '')
+    print(f'{state.move_count} moves played, ' + ('solved' if state.is_won() else 'not solved')
+          + ('' if legal else ' (stopped at a blocked move)'))
@@ -0,0 +1,193 @@
+# An index of every level in the levels folder, with what is known about each, kept in SQLite between runs
+# Usage: python level_library.py [levels directory] [--sort name|size|boxes|best] [--search TEXT] [--solved]
+
+import os
+import sqlite3
+import argparse
+from level_loader import load_level
+from level_pack import LevelPack, is_pack
+
+LEVELS_DIR = './levels'
+LIBRARY_FILE = './library.db'
+
+# Orders the library can be sorted in, ties are always broken by name
+SORT_ORDERS = {
+    'name': 'name COLLATE NOCASE',
+    'size': 'cols * rows',
+    'boxes': 'boxes',
+    # Unsolved levels have no best score, they come after every solved level
+    'best': 'best_moves IS NULL, best_moves',
+}
+
+'''
+Each level file, or each level in a pack, is one row with its size, box and goal counts
+Rows remember the modification time and size of the file they were read from
+A rescan only stats the files in the folder, and only reads the ones that are new or have changed since
+Scores are kept in a table of their own, so they are not lost when a level's file is read again
+'''
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS levels (
+    file TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    mtime INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    valid INTEGER NOT NULL,
+    cols INTEGER,
+    rows INTEGER,
+    boxes INTEGER,
+    goals INTEGER,
+    PRIMARY KEY (file, number)
+);
+CREATE INDEX IF NOT EXISTS levels_by_name ON levels (name COLLATE NOCASE, file, number);
+CREATE TABLE IF NOT EXISTS scores (
+    file TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    best_moves INTEGER NOT NULL,
+    best_pushes INTEGER NOT NULL,
+    PRIMARY KEY (file, number)
+);
+'''
+
+
+def get_file_name(path):
+    # Level files are named after their level, with underscores for spaces
+    return os.path.splitext(os.path.basename(path))[0].replace('_', ' ')
+
+
+def load_library_level(file, number=0):
+    # Loads a level from a row of the library, wherever it is kept
+    if is_pack(file):
+        with LevelPack(file) as pack:
+            return pack[number]
+    return load_level(file)
+
+
+class LevelLibrary:
+
+    def __init__(self, library_file=LIBRARY_FILE):
+        self.db = sqlite3.connect(library_file)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def get_level_rows(self, file, stat):
+        # Reads every level in a file, a level that cannot be read is kept as invalid so it is not read again
+        if is_pack(file):
+            try:
+                with LevelPack(file) as pack:
+                    levels = [(number, pack.get_title(number), self.try_level(pack.get_level, number))
+                              for number in range(0, len(pack))]
+            except OSError:
+                levels = []
+        else:
+            levels = [(0, get_file_name(file), self.try_level(load_level, file))]
+        rows = []
+        for number, name, level in levels:
+            if level is None:
+                rows.append((file, number, name, stat.st_mtime_ns, stat.st_size, 0, None, None, None, None))
+            else:
+                rows.append((file, number, name, stat.st_mtime_ns, stat.st_size, 1, level.cols, level.rows,
+                             len(level.box_starts), len(level.goal_cells)))
+        return rows
+
+    def try_level(self, load, *args):
+        try:
+            return load(*args)
+        except (OSError, ValueError, KeyError, IndexError, TypeError):
+            return None
+
+    def scan(self, levels_dir=LEVELS_DIR):
+        # Brings the library up to date with the folder, returning how many files were read again
+        scanned = {row['file']: (row['mtime'], row['size']) for row in
+                   self.db.execute('SELECT file, mtime, size FROM levels GROUP BY file')}
+        found = set()
+        changed = 0
+        with self.db:
+            for name in os.listdir(levels_dir):
+                file = os.path.join(levels_dir, name)
+                try:
+                    stat = os.stat(file)
+                except OSError:
+                    continue
+                if not os.path.isfile(file):
+                    continue
+                found.add(file)
+                if scanned.get(file) == (stat.st_mtime_ns, stat.st_size):
+                    continue
+                changed += 1
+                self.db.execute('DELETE FROM levels WHERE file = ?', (file,))
+                self.db.executemany('INSERT INTO levels VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                    self.get_level_rows(file, stat))
+            for file in scanned.keys() - found:
+                self.db.execute('DELETE FROM levels WHERE file = ?', (file,))
+        return changed
+
+    def remove(self, file):
+        with self.db:
+            self.db.execute('DELETE FROM levels WHERE file = ?', (file,))
+
+    def record_score(self, file, number, moves, pushes):
+        # Keeps the fewest moves the level has been solved in, fewest pushes breaking ties
+        with self.db:
+            self.db.execute('''
+                INSERT INTO scores VALUES (?, ?, ?, ?)
+                ON CONFLICT (file, number) DO UPDATE SET best_moves = excluded.best_moves,
+                                                         best_pushes = excluded.best_pushes
+                WHERE (excluded.best_moves, excluded.best_pushes) < (best_moves, best_pushes)
+            ''', (file, number, moves, pushes))
+
+    def get_filter(self, search, solved):
+        conditions = ['valid = 1']
+        parameters = []
+        if search:
+            conditions.append("name LIKE ? ESCAPE '\\'")
+            parameters.append('%' + search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+        if solved is not None:
+            conditions.append('best_moves IS NOT NULL' if solved else 'best_moves IS NULL')
+        return ' AND '.join(conditions), parameters
+
+    def count(self, search='', solved=None):
+        where, parameters = self.get_filter(search, solved)
+        return self.db.execute(f'SELECT COUNT(*) FROM levels LEFT JOIN scores USING (file, number) WHERE {where}',
+                               parameters).fetchone()[0]
+
+    def query(self, search='', solved=None, sort='name', descending=False, offset=0, limit=-1):
+        '''
+        Returns one page of the levels matching the search and solved filters, in the order asked for
+        Only the rows on the page are read, so paging through a large library costs the same on every page
+        '''
+        where, parameters = self.get_filter(search, solved)
+        direction = 'DESC' if descending else 'ASC'
+        # Sorting by name matches the index on names, so a page can be read without sorting the whole library
+        columns = SORT_ORDERS[sort].split(', ')
+        columns += (['name COLLATE NOCASE'] if sort != 'name' else []) + ['file', 'number']
+        order = ', '.join(f'{column} {direction}' for column in columns)
+        return self.db.execute(f'''
+            SELECT file, number, name, cols, rows, boxes, goals, best_moves, best_pushes
+            FROM levels LEFT JOIN scores USING (file, number)
+            WHERE {where}
+            ORDER BY {order}
+            LIMIT ? OFFSET ?
+        ''', parameters + [limit, offset]).fetchall()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Update and list the PySoko level library')
+    parser.add_argument('levels_dir', nargs='?', default=LEVELS_DIR, help='directory of level files and packs')
+    parser.add_argument('--library', default=LIBRARY_FILE, help='SQLite file the library is kept in')
+    parser.add_argument('--sort', choices=SORT_ORDERS, default='name', help='order to list the levels in')
+    parser.add_argument('--search', default='', help='only list levels with this in their name')
+    parser.add_argument('--solved', action='store_true', help='only list levels that have been solved')
+    args = parser.parse_args()
+
+    library = LevelLibrary(args.library)
+    changed = library.scan(args.levels_dir)
+    for row in library.query(args.search, True if args.solved else None, args.sort):
+        best = f", best {row['best_moves']} moves" if row['best_moves'] is not None else ''
+        print(f"{row['name']}: {row['cols']}x{row['rows']}, {row['boxes']} boxes{best}")
+    print(f'{library.count(args.search, True if args.solved else None)} levels, {changed} files read again')
+    library.close()
@@ -0,0 +1,144 @@
+# Loads a level from any of the level file formats, keeping a compiled copy of each so it is only parsed once
+# Usage: python level_loader.py <level file> [<level file> ...]
+
+import os
+import sys
+import json
+import struct
+import hashlib
+import tempfile
+from array import array
+from game_core import Level, FLOOR, GOAL, WALL, check_on_grid
+
+CACHE_DIR = './.cache/levels'
+
+# Level file formats
+# map: rows of cell characters as written by hand, coordinates are (column, row)
+MAP_FORMAT = 'map'
+# editor: a square grid of floor written by create_level.py, coordinates are (column, row)
+EDITOR_FORMAT = 'editor'
+# text: a grid of floor used by the text version of the game, coordinates are (row, column)
+TEXT_FORMAT = 'text'
+
+'''
+Every format is turned into the same Level from the game core, so nothing past here knows which it came from
+Compiled levels are kept as small binary files in the cache, named from the level's path
+Each holds the modification time and size of the file it was compiled from, and is only used while they match
+A compiled level is a header followed by the cells, one byte each, and the box cells, four bytes each,
+then the level's dead cells as found by the game core, so loading a compiled level does not search for them again
+'''
+
+# Magic, version, source modification time and size, columns, rows, player cell, box count
+HEADER = struct.Struct('<4sHqqIIII')
+MAGIC = b'PSKL'
+VERSION = 1
+
+
+def detect_format(level_data):
+    if 'map' in level_data:
+        return MAP_FORMAT
+    if 'grid_dim' in level_data:
+        return EDITOR_FORMAT
+    if 'grid_dimensions' in level_data:
+        return TEXT_FORMAT
+    raise ValueError(f'unrecognised level format with keys {sorted(level_data)}')
+
+
+def from_coords(cols, rows, wall_coords, goal_coords, player_coords, box_coords, name=''):
+    # Formats that list their walls and goals are floor everywhere else
+    cells = bytearray([FLOOR]) * (cols * rows)
+    for item, name, coords in ((GOAL, 'goal', goal_coords), (WALL, 'wall', wall_coords)):
+        for col, row in coords:
+            check_on_grid(name, (col, row), cols, rows)
+            cells[row * cols + col] = item
+    return Level(cols, rows, cells, player_coords, box_coords, name)
+
+
+def level_from_data(level_data, name=''):
+    level_format = detect_format(level_data)
+    if level_format == MAP_FORMAT:
+        return Level.from_level_data(level_data, name)
+    if level_format == EDITOR_FORMAT:
+        # The editor saves a list of players, a level has exactly one
+        if len(level_data['player_coords']) != 1:
+            raise ValueError(f"level needs one player, not {len(level_data['player_coords'])}")
+        return from_coords(level_data['grid_dim'], level_data['grid_dim'], level_data['wall_coords'],
+                           level_data['goal_tile_coords'], level_data['player_coords'][0],
+                           level_data['box_coords'], name)
+    cols, rows = level_data['grid_dimensions']
+    return from_coords(cols, rows, [coords[::-1] for coords in level_data['wall_coords']],
+                       [coords[::-1] for coords in level_data['gtile_coords']], level_data['player_coords'][::-1],
+                       [coords[::-1] for coords in level_data['box_coords']], name)
+
+
+def get_cache_file(path, cache_dir, extension='.lvl'):
+    key = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()
+    return os.path.join(cache_dir, f'{key}{extension}')
+
+
+def compile_level(level, stat):
+    boxes = array('I', (row * level.cols + col for col, row in map(level.coords, level.box_starts)))
+    col, row = level.coords(level.player_start)
+    cells = bytearray()
+    for row_start in range(0, level.rows):
+        start = level.index(0, row_start)
+        cells += level.cells[start:start + level.cols]
+    return HEADER.pack(MAGIC, VERSION, stat.st_mtime_ns, stat.st_size, level.cols, level.rows,
+                       row * level.cols + col, len(boxes)) + cells + boxes.tobytes() + level.dead
+
+
+def read_compiled(cache_file, stat, name=''):
+    # Returns the level compiled from the file as it is now, or None if there is no such compiled copy
+    try:
+        with open(cache_file, 'rb') as file:
+            data = file.read()
+        magic, version, mtime, size, cols, rows, player, box_count = HEADER.unpack_from(data)
+    except (OSError, struct.error):
+        return None
+    if magic != MAGIC or version != VERSION or mtime != stat.st_mtime_ns or size != stat.st_size:
+        return None
+    boxes_start = HEADER.size + cols * rows
+    dead_start = boxes_start + 4 * box_count
+    if len(data) != dead_start + (cols + 2) * (rows + 2):
+        return None
+    cells = data[HEADER.size:boxes_start]
+    boxes = array('I', data[boxes_start:dead_start])
+    dead = data[dead_start:]
+    return Level(cols, rows, cells, divmod(player, cols)[::-1], [divmod(box, cols)[::-1] for box in boxes], name,
+                 dead)
+
+
+def write_cache_file(cache_file, data):
+    # Written to a temporary file first, so a reader in another process never sees half a file
+    temp_file = None
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        descriptor, temp_file = tempfile.mkstemp(dir=os.path.dirname(cache_file), suffix='.tmp')
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(data)
+        os.replace(temp_file, cache_file)
+    except OSError:
+        # A cache that cannot be written only means the work it would have saved is done again next time
+        if temp_file and os.path.exists(temp_file):
+            os.unlink(temp_file)
+
+
+def load_level(path, cache_dir=CACHE_DIR):
+    stat = os.stat(path)
+    cache_file = get_cache_file(path, cache_dir) if cache_dir else None
+    level = read_compiled(cache_file, stat, path) if cache_file else None
+    if level is None:
+        with open(path) as file:
+            level = level_from_data(json.load(file), path)
+        if cache_file:
+            write_cache_file(cache_file, compile_level(level, stat))
+    return level
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print('Usage: python level_loader.py <level file> [<level file> ...]', file=sys.stderr)
+        sys.exit(2)
+    for path in sys.argv[1:]:
+        level = load_level(path)
+        print(f'{path}: {level.cols}x{level.rows}, {len(level.box_starts)} boxes, {len(level.goal_cells)} goals')
@@ -0,0 +1,192 @@
+# Many levels in one file, in the XSB/SOK text format used by most Sokoban level collections
+# Usage: python level_pack.py <pack file> [level number]
+
+import os
+import re
+import sys
+import mmap
+import struct
+from array import array
+from game_core import Level, VOID, FLOOR, GOAL, WALL
+from level_loader import get_cache_file, write_cache_file
+
+CACHE_DIR = './.cache/packs'
+PACK_EXTENSIONS = ('.xsb', '.sok')
+
+'''
+In XSB, a level is drawn as rows of characters, and levels are separated by blank lines, titles and comments
+The first time a pack is opened, its levels are found with one pass over the file and their offsets are saved
+After that, opening a pack only reads its index, and a level is only read and parsed when it is asked for
+The file is memory mapped, so reading one level never reads the rest of the file
+'''
+
+# Cells in XSB, floor may be drawn as a space, '-' or '_'
+XSB_WALLS = b'#'
+XSB_GOALS = b'.*+'
+XSB_PLAYERS = b'@+'
+XSB_BOXES = b'$*'
+
+# One or more lines in a row that are only level characters, each line having at least one wall
+LEVEL_PATTERN = re.compile(rb'(?:^[ \t_-]*#[ \t#@+$*._-]*(?:\r?\n|\Z))+', re.MULTILINE)
+TITLE_PATTERN = re.compile(rb'^\s*(?:title:\s*|;\s*)(.+?)\s*$', re.IGNORECASE | re.MULTILINE)
+
+# Magic, version, pack modification time and size, level count, followed by a start and end offset for each level
+HEADER = struct.Struct('<4sHqqI')
+MAGIC = b'PSKP'
+VERSION = 1
+
+
+def is_pack(path):
+    return path.lower().endswith(PACK_EXTENSIONS)
+
+
+def parse_xsb(text, name=''):
+    '''
+    Spaces inside the walls are floor, but so are the spaces outside them, before each row starts
+    Cells the player can walk to are floor, any other space is void
+    '''
+    lines = [line.rstrip() for line in text.splitlines() if line.strip()]
+    cols = max(len(line) for line in lines)
+    rows = len(lines)
+    cells = bytearray(cols * rows)
+    player_coords = None
+    box_coords = []
+    for row, line in enumerate(lines):
+        for col, item in enumerate(line.encode()):
+            if item in XSB_WALLS:
+                cells[row * cols + col] = WALL
+            elif item in XSB_GOALS:
+                cells[row * cols + col] = GOAL
+            if item in XSB_PLAYERS:
+                if player_coords is not None:
+                    raise ValueError('level has more than one player')
+                player_coords = (col, row)
+            if item in XSB_BOXES:
+                box_coords.append((col, row))
+    if player_coords is None:
+        raise ValueError('level has no player')
+
+    frontier = [player_coords]
+    reached = {player_coords}
+    for col, row in frontier:
+        if cells[row * cols + col] == VOID:
+            cells[row * cols + col] = FLOOR
+        for step_col, step_row in ((-1, 0), (0, -1), (1, 0), (0, 1)):
+            next_coords = (col + step_col, row + step_row)
+            if 0 <= next_coords[0] < cols and 0 <= next_coords[1] < rows and next_coords not in reached \
+                    and cells[next_coords[1] * cols + next_coords[0]] != WALL:
+                reached.add(next_coords)
+                frontier.append(next_coords)
+    # Boxes are always on floor, even one the player has no way to reach
+    for col, row in box_coords:
+        if cells[row * cols + col] == VOID:
+            cells[row * cols + col] = FLOOR
+    return Level(cols, rows, cells, player_coords, box_coords, name)
+
+
+class LevelPack:
+
+    '''
+    Levels are numbered from 0 in the order they appear in the file
+    A pack keeps its file open while it is in use, close it or use it in a with statement when done
+    '''
+
+    def __init__(self, path, cache_dir=CACHE_DIR):
+        self.path = path
+        self.cache_dir = cache_dir
+        self.file = open(path, 'rb')
+        self.stat = os.fstat(self.file.fileno())
+        # An empty file cannot be memory mapped, but it is still a pack, just one with no levels
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.stat.st_size else b''
+        self.titles_after = None
+        self.offsets = self.read_index() if cache_dir else None
+        if self.offsets is None:
+            self.offsets = self.build_index()
+            if cache_dir:
+                write_cache_file(self.get_cache_file(), HEADER.pack(MAGIC, VERSION, self.stat.st_mtime_ns,
+                                                                    self.stat.st_size, len(self.offsets) // 2)
+                                 + self.offsets.tobytes())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self.offsets) // 2
+
+    def __getitem__(self, number):
+        return self.get_level(number)
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+    def get_cache_file(self):
+        return get_cache_file(self.path, self.cache_dir, '.idx')
+
+    def read_index(self):
+        # Returns the saved offsets if they were saved for the pack as it is now, otherwise None
+        try:
+            with open(self.get_cache_file(), 'rb') as file:
+                data = file.read()
+            magic, version, mtime, size, count = HEADER.unpack_from(data)
+        except (OSError, struct.error):
+            return None
+        if magic != MAGIC or version != VERSION or mtime != self.stat.st_mtime_ns or size != self.stat.st_size \
+                or len(data) != HEADER.size + count * 2 * 8:
+            return None
+        return array('Q', data[HEADER.size:])
+
+    def build_index(self):
+        offsets = array('Q')
+        for match in LEVEL_PATTERN.finditer(self.data):
+            offsets.extend(match.span())
+        return offsets
+
+    def get_span(self, number):
+        if not 0 <= number < len(self):
+            raise IndexError(f'{self.path} has {len(self)} levels, there is no level {number}')
+        return self.offsets[2 * number], self.offsets[2 * number + 1]
+
+    def get_titles_after(self):
+        # Packs put titles either after each level, as in SOK files, or before it
+        # Only packs with titles after their levels have one after the last level, so that is the one checked
+        if self.titles_after is None:
+            self.titles_after = len(self) > 0 and TITLE_PATTERN.search(self.data[self.offsets[-1]:]) is not None
+        return self.titles_after
+
+    def get_title(self, number):
+        # A title is a 'Title:' line or a comment line in the gap between this level and the next or last one
+        start, end = self.get_span(number)
+        if self.get_titles_after():
+            gap = self.data[end:self.offsets[2 * number + 2] if number + 1 < len(self) else len(self.data)]
+            match = TITLE_PATTERN.search(gap)
+        else:
+            gap = self.data[self.offsets[2 * number - 1] if number > 0 else 0:start]
+            # The title closest to the level is the one that belongs to it
+            match = None
+            for match in TITLE_PATTERN.finditer(gap):
+                pass
+        if match:
+            return match.group(1).decode(errors='replace')
+        return f'Level {number + 1}'
+
+    def get_level(self, number):
+        start, end = self.get_span(number)
+        return parse_xsb(self.data[start:end].decode(errors='replace'), self.get_title(number))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print('Usage: python level_pack.py <pack file> [level number]', file=sys.stderr)
+        sys.exit(2)
+    with LevelPack(sys.argv[1]) as pack:
+        if len(sys.argv) > 2:
+            level = pack[int(sys.argv[2]) - 1]
+            print(f'{level.name}: {level.cols}x{level.rows}, {len(level.box_starts)} boxes, '
+                  f'{len(level.goal_cells)} goals')
+        else:
+            print(f'{sys.argv[1]}: {len(pack)} levels')
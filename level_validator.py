@@ -0,0 +1,165 @@
+# Checks levels against the conditions for a valid level, a whole directory or pack at a time in parallel
+# Usage: python level_validator.py [levels directory or pack file] [--jobs N] [--all]
+
+import os
+import sys
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from game_core import VOID, WALL
+from level_loader import load_level, level_from_data
+from level_pack import LevelPack, is_pack
+
+LEVELS_DIR = './levels'
+# Levels in a pack are shared out between the workers in runs of this many
+PACK_CHUNK_SIZE = 500
+
+'''
+The conditions for a valid level, as listed at the top of walk_pygame.py:
+- Closed off by walls, so the player can never walk off the level
+- Not already completed, so at least one goal is uncovered
+- At least as many boxes as goals
+On top of these, every box and goal must be somewhere the player can get to, or the level could never be won
+All of them are checked with one flood fill from the player through every cell that is not a wall
+Boxes do not stop the fill, as the player can push them out of the way
+A player, box, wall or goal off the grid is caught before any of this, as such a level is never built
+The game treats void as impassable, so a level that is not closed off can still be played, just not saved
+'''
+
+
+def find_reachable(level):
+    # Returns the cells the player can get to, and the cells the player could walk off the level from
+    reached = bytearray(level.size)
+    reached[level.player_start] = 1
+    frontier = [level.player_start]
+    open_cells = []
+    for cell in frontier:
+        for step in level.steps:
+            next_cell = cell + step
+            if reached[next_cell] or level.cells[next_cell] == WALL:
+                continue
+            if level.cells[next_cell] == VOID:
+                # Void is outside the level, and the ring of padding around the grid is void, so the fill stops here
+                open_cells.append(cell)
+                continue
+            reached[next_cell] = 1
+            frontier.append(next_cell)
+    return reached, open_cells
+
+
+def find_problems(level, closed=True):
+    # Returns what is wrong with the level, an empty list for a valid level
+    # With closed False, only problems that make the level unplayable or unwinnable are returned
+    if not level.walkable[level.player_start]:
+        return [f'player is on a wall or void at {level.coords(level.player_start)}']
+    problems = []
+    boxes = set(level.box_starts)
+    if len(boxes) != len(level.box_starts):
+        problems.append('more than one box on the same cell')
+    blocked = [box for box in boxes if not level.walkable[box]]
+    if blocked:
+        problems.append(f'{len(blocked)} boxes on a wall or void, the first at {level.coords(blocked[0])}')
+
+    reached, open_cells = find_reachable(level)
+    if closed and open_cells:
+        problems.append(f'not closed off by walls, the player can walk off the level at {level.coords(open_cells[0])}')
+    if not level.goal_cells:
+        problems.append('level has no goals')
+    elif all(goal in boxes for goal in level.goal_cells):
+        problems.append('level is already completed')
+    if len(boxes) < len(level.goal_cells):
+        problems.append(f'{len(boxes)} boxes for {len(level.goal_cells)} goals')
+
+    unreached_boxes = sum(1 for box in boxes if not reached[box])
+    if unreached_boxes:
+        problems.append(f'{unreached_boxes} boxes the player can never get to')
+    unreached_goals = sum(1 for goal in level.goal_cells if not reached[goal])
+    if unreached_goals:
+        problems.append(f'{unreached_goals} goals the player can never get to')
+    # More boxes starting on dead cells than there are spare boxes means the level is lost before it starts
+    if sum(1 for box in boxes if level.dead[box]) > max(0, level.spare_boxes):
+        problems.append('boxes start where they can never be pushed onto a goal')
+    return problems
+
+
+def check_level(level, closed=True):
+    # Raises ValueError for a level breaking any of the conditions, saying what is wrong with it
+    problems = find_problems(level, closed)
+    if problems:
+        raise ValueError('; '.join(problems))
+
+
+def validate_data(level_data, name=''):
+    # Level data as written by the editor or found in a level file, data that is not a level at all is a problem too
+    try:
+        return find_problems(level_from_data(level_data, name))
+    except (ValueError, KeyError, IndexError, TypeError) as error:
+        return [f'not a level: {error}']
+
+
+def get_result(file, number, name, load, *args):
+    try:
+        problems = find_problems(load(*args))
+    except (OSError, ValueError, KeyError, IndexError, TypeError) as error:
+        problems = [f'not a level: {error}']
+    return {'file': file, 'number': number, 'name': name, 'problems': problems}
+
+
+def validate_file(file, start=0, stop=None):
+    # A level file is level 0, a pack is checked from level start up to but not including level stop
+    if not is_pack(file):
+        return [get_result(file, 0, os.path.basename(file), load_level, file)]
+    with LevelPack(file) as pack:
+        return [get_result(file, number, pack.get_title(number), pack.get_level, number)
+                for number in range(start, min(len(pack), stop if stop is not None else len(pack)))]
+
+
+def get_tasks(path, chunk_size=PACK_CHUNK_SIZE):
+    # The (file, start, stop) runs of levels to check, one for each level file and one for each chunk of a pack
+    files = [path] if not os.path.isdir(path) else sorted(
+        os.path.join(path, name) for name in os.listdir(path) if os.path.isfile(os.path.join(path, name)))
+    tasks = []
+    for file in files:
+        if not is_pack(file):
+            tasks.append((file, 0, None))
+            continue
+        try:
+            with LevelPack(file) as pack:
+                count = len(pack)
+        except OSError:
+            # Reported as a level that cannot be read when the worker tries to open it
+            count = 1
+        tasks.extend((file, start, start + chunk_size) for start in range(0, count, chunk_size))
+    return tasks
+
+
+def validate_all(path=LEVELS_DIR, jobs=None, chunk_size=PACK_CHUNK_SIZE):
+    '''
+    Checks every level in a directory or pack, in worker processes using every core by default
+    Returns a result for each level in file and level order, with the problems found in it
+    '''
+    results = []
+    with ProcessPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+        futures = [pool.submit(validate_file, *task) for task in get_tasks(path, chunk_size)]
+        for future in as_completed(futures):
+            try:
+                results.extend(future.result())
+            except OSError as error:
+                # A pack that could not be opened by its worker
+                results.append({'file': error.filename, 'number': 0, 'name': '', 'problems': [str(error)]})
+    return sorted(results, key=lambda result: (result['file'] or '', result['number']))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check every PySoko level in a directory or pack')
+    parser.add_argument('path', nargs='?', default=LEVELS_DIR, help='directory of level files and packs, or a pack')
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: one per core)')
+    parser.add_argument('--all', action='store_true', help='list valid levels as well as invalid ones')
+    args = parser.parse_args()
+
+    results = validate_all(args.path, args.jobs)
+    invalid = [result for result in results if result['problems']]
+    for result in results if args.all else invalid:
+        level = f"{result['file']} #{result['number'] + 1}" if is_pack(result['file'] or '') else result['file']
+        print(f"{level} ({result['name']}): {'; '.join(result['problems']) or 'valid'}")
+    print(f'{len(results)} levels checked, {len(invalid)} invalid')
+    sys.exit(1 if invalid else 0)
@@ -0,0 +1,146 @@
+# Level preview thumbnails, rendered on a background thread and cached on disk
+
+import io
+import os
+import queue
+import hashlib
+import threading
+import pygame as pg
+from game_core import FLOOR, GOAL, WALL
+from level_library import load_library_level
+from level_loader import write_cache_file
+
+CACHE_DIR = './.cache/previews'
+
+# Posted to the event queue when a thumbnail is ready, so a menu waiting for input wakes up to draw it
+PREVIEW_READY = pg.USEREVENT + 1
+
+
+def render_preview(level, size, colours):
+    '''
+    Draws each cell as a block of colour, the largest square size that fits the level in the thumbnail
+    Filling rectangles needs no images or display, so this is safe to run off the main thread
+    '''
+    surface = pg.Surface(size)
+    surface.fill(colours['background'])
+    cell = max(1, min(size[0] // level.cols, size[1] // level.rows))
+    offset = ((size[0] - cell * level.cols) // 2, (size[1] - cell * level.rows) // 2)
+    cell_colours = {FLOOR: colours['tile'], GOAL: colours['goal_tile'], WALL: colours['wall']}
+    for row in range(0, level.rows):
+        for col in range(0, level.cols):
+            item = level.get_cell(col, row)
+            if item in cell_colours:
+                surface.fill(cell_colours[item], (offset[0] + col * cell, offset[1] + row * cell, cell, cell))
+    # Boxes and the player are drawn a little smaller than a cell so the goal under them still shows
+    for box in level.box_starts:
+        col, row = level.coords(box)
+        surface.fill(colours['box'], (offset[0] + col * cell + cell // 6, offset[1] + row * cell + cell // 6,
+                                      cell - cell // 3, cell - cell // 3))
+    col, row = level.coords(level.player_start)
+    surface.fill(colours['player'], (offset[0] + col * cell + cell // 6, offset[1] + row * cell + cell // 6,
+                                     cell - cell // 3, cell - cell // 3))
+    return surface
+
+
+class PreviewLoader:
+
+    '''
+    Thumbnails are made on a single background thread, so the menu never waits on one
+    Each is saved as a PNG named from the level's path and number, modification time and the thumbnail size,
+    so an edited level gets a new thumbnail and an unchanged one is only read back from disk
+    Requests are served newest first, as the newest is the level the player is looking at now
+    '''
+
+    def __init__(self, size, colours, cache_dir=CACHE_DIR):
+        self.size = size
+        self.colours = colours
+        self.cache_dir = cache_dir
+        self.requests = queue.LifoQueue()
+        self.lock = threading.Lock()
+        # Finished thumbnails by (level path, number), as (modification time, surface)
+        self.ready = {}
+        self.pending = set()
+        self.thread = threading.Thread(target=self.work, daemon=True)
+        self.thread.start()
+
+    def get_mtime(self, path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def get(self, path, number=0):
+        # Returns the thumbnail if it is ready, otherwise asks for it and returns None for a placeholder to be drawn
+        # Levels in a pack are told apart by their number, a file with one level in it is number 0
+        key = (path, number)
+        mtime = self.get_mtime(path)
+        with self.lock:
+            if key in self.ready and self.ready[key][0] == mtime:
+                return self.ready[key][1]
+            if key in self.pending:
+                return None
+            self.pending.add(key)
+        self.requests.put((key, mtime))
+        return None
+
+    def get_cache_file(self, key, mtime):
+        path, number = key
+        digest = hashlib.sha1(f'{os.path.abspath(path)}|{number}|{mtime}|{self.size[0]}x{self.size[1]}'.encode())
+        return os.path.join(self.cache_dir, f'{digest.hexdigest()}.png')
+
+    def make_blank(self):
+        surface = pg.Surface(self.size)
+        surface.fill(self.colours['background'])
+        return surface
+
+    def read_cache_file(self, cache_file):
+        # Returns the saved thumbnail, or None if there is none, a file that cannot be read is removed
+        if not os.path.exists(cache_file):
+            return None
+        try:
+            return pg.image.load(cache_file)
+        except (pg.error, OSError):
+            try:
+                os.unlink(cache_file)
+            except OSError:
+                pass
+            return None
+
+    def save_cache_file(self, surface, cache_file):
+        # Encoded in memory and written through a temporary file, so a thumbnail is never left half written
+        data = io.BytesIO()
+        try:
+            pg.image.save(surface, data, cache_file)
+        except pg.error:
+            return
+        write_cache_file(cache_file, data.getvalue())
+
+    def make_preview(self, key, mtime):
+        cache_file = self.get_cache_file(key, mtime)
+        surface = self.read_cache_file(cache_file)
+        if surface is not None:
+            return surface
+        try:
+            surface = render_preview(load_library_level(*key), self.size, self.colours)
+        except (OSError, ValueError, KeyError, IndexError, TypeError):
+            # A level that cannot be read gets an empty thumbnail, which is not worth caching
+            return self.make_blank()
+        self.save_cache_file(surface, cache_file)
+        return surface
+
+    def work(self):
+        while True:
+            key, mtime = self.requests.get()
+            try:
+                surface = self.make_preview(key, mtime)
+            except Exception:
+                # This is the only thread making thumbnails, whatever goes wrong with one it carries on with the rest
+                surface = self.make_blank()
+            with self.lock:
+                self.ready[key] = (mtime, surface)
+                self.pending.discard(key)
+            try:
+                pg.event.post(pg.event.Event(PREVIEW_READY, path=key[0], number=key[1]))
+            except pg.error:
+                # The display has been closed, so there is no menu left to wake
+                return
@@ -0,0 +1,100 @@
+# One window and one main loop, shared by every screen of the game through a stack of scenes
+
+import pygame as pg
+from scheduler import FrameScheduler, FPS
+
+
+class Scene:
+
+    '''
+    A screen of the game, such as the main menu, a level being played or the level editor
+    A scene keeps its state and surfaces for as long as it is on the stack, so going back to it is instant
+    Only the scene on top of the stack is drawn and given events
+    '''
+
+    caption = 'PySoko'
+    # Held keys repeat with this (delay, interval) in milliseconds while the scene is on top, (0, 0) turns it off
+    key_repeat = (0, 0)
+
+    def __init__(self, manager):
+        self.manager = manager
+
+    @property
+    def screen(self):
+        # Always the window's current surface, which changes when the window is resized
+        return self.manager.screen
+
+    def enter(self):
+        # Called when the scene comes to the top of the stack, either pushed or uncovered by the one above leaving
+        pg.display.set_caption(self.caption)
+        pg.key.set_repeat(*self.key_repeat)
+
+    def leave(self):
+        # Called when the scene stops being the top of the stack, either popped or covered by a new scene
+        pass
+
+    def resize(self):
+        # Called on every scene in the stack when the window is resized
+        pass
+
+    def handle_event(self, event):
+        # Closing the window leaves the scene, so the last scene to leave ends the game
+        if event.type == pg.QUIT:
+            self.manager.pop()
+
+    def draw(self):
+        # Draws the scene and updates the display, called before waiting for the next events
+        pass
+
+
+class SceneManager:
+
+    '''
+    Owns the window and runs the only main loop, always for the scene on top of the stack
+    Screens are opened by pushing a scene and closed by popping it, the window is never made again
+    The game ends once the last scene has been popped
+    Each time round the loop, every event waiting is handled first and then the scene is drawn once
+    '''
+
+    def __init__(self, size, flags=0, fps=FPS):
+        pg.init()
+        self.screen = pg.display.set_mode(size, flags)
+        self.scheduler = FrameScheduler(fps)
+        self.scenes = []
+
+    def get_scene(self):
+        return self.scenes[-1] if self.scenes else None
+
+    def push(self, scene):
+        if self.scenes:
+            self.scenes[-1].leave()
+        self.scenes.append(scene)
+        scene.enter()
+
+    def pop(self):
+        scene = self.scenes.pop()
+        scene.leave()
+        if self.scenes:
+            self.scenes[-1].enter()
+        return scene
+
+    def replace(self, scene):
+        self.scenes.pop().leave()
+        self.scenes.append(scene)
+        scene.enter()
+
+    def run(self):
+        while self.scenes:
+            # Draw before waiting for input, the scheduler may block until the next event arrives
+            self.scenes[-1].draw()
+
+            for event in self.scheduler.get_events():
+                if event.type == pg.VIDEORESIZE:
+                    self.screen = pg.display.get_surface()
+                    for scene in self.scenes:
+                        scene.resize()
+                # Events after a scene has been pushed or popped go to the new top scene
+                if self.scenes:
+                    self.scenes[-1].handle_event(event)
+
+        pg.quit()
@@ -0,0 +1,36 @@
+# Waits for input instead of going round every loop at a fixed frame rate while nothing is changing
+
+import pygame as pg
+
+FPS = 30
+# Longest time in milliseconds to wait for an event while idle, so a loop still comes round now and then
+IDLE_TIMEOUT = 1000
+
+
+class FrameScheduler:
+
+    '''
+    Every screen's main loop gets its events from here instead of calling clock.tick and pg.event.get itself
+    While nothing is animating, it blocks on pg.event.wait until there is input, using no CPU in between
+    While something is animating, it ticks at the full frame rate so the animation stays smooth
+    Bursts of input, such as mouse movement, are still held to the frame rate so they cannot spin the CPU
+    '''
+
+    def __init__(self, fps=FPS, idle_timeout=IDLE_TIMEOUT):
+        self.clock = pg.time.Clock()
+        self.fps = fps
+        self.idle_timeout = idle_timeout
+        self.animating = False
+
+    def set_animating(self, animating):
+        self.animating = animating
+
+    def get_events(self):
+        if self.animating:
+            self.clock.tick(self.fps)
+            return pg.event.get()
+        event = pg.event.wait(self.idle_timeout)
+        self.clock.tick(self.fps)
+        # Waking up from the timeout gives a NOEVENT, which the loops have no use for
+        events = [] if event.type == pg.NOEVENT else [event]
+        return events + pg.event.get()
@@ -0,0 +1,250 @@
+# Solve Sokoban levels with a push-based A* search over the game core
+# Usage: python solver.py <level file or pack> [level number] [--max-nodes N] [--time-limit SECONDS]
+
+import sys
+import time
+import heapq
+import argparse
+from game_core import GameState, UNREACHABLE
+from level_library import load_library_level
+
+# Default search budget
+MAX_NODES = 1000000
+TIME_LIMIT = 60
+
+# How many nodes are expanded between checks of the time limit
+TIME_CHECK_INTERVAL = 1000
+
+# Outcomes of a search
+SOLVED = 'solved'
+UNSOLVABLE = 'unsolvable'
+GAVE_UP = 'gave up'
+
+'''
+How the search works:
+- A node is a set of box cells and the region the player can walk around, found with the core's flood fill
+- Nodes are told apart by their Zobrist hash, the boxes' hash updated with two XORs on each push
+  and the player hashed by the lowest cell of their region, as GameState.get_state_hash does
+- Walking inside the region costs nothing to the search, only pushes are expanded and counted
+- The heuristic matches boxes to goals and adds up how many pushes each box is from its goal
+- Positions where the boxes can no longer cover every goal are never queued
+- Boxes on dead cells or frozen off a goal can never reach a goal, they are lost
+- Pushes that lose more boxes than the level has spare are rejected, dead cells before anything else
+- Once a solution is found, the walks between pushes are filled in to give a full move string
+'''
+
+
+class Solution:
+
+    def __init__(self, status, moves, nodes, elapsed):
+        self.status = status
+        self.moves = moves
+        self.nodes = nodes
+        self.elapsed = elapsed
+
+    def is_solved(self):
+        return self.status == SOLVED
+
+    def __str__(self):
+        if self.is_solved():
+            return self.moves
+        return self.status
+
+
+class Solver:
+
+    def __init__(self, level, max_nodes=MAX_NODES, time_limit=TIME_LIMIT):
+        self.level = level
+        self.max_nodes = max_nodes
+        self.time_limit = time_limit
+        self.steps = level.steps
+        self.walkable = level.walkable
+        self.goal_count = len(level.goal_cells)
+        self.dead = level.dead
+        self.box_keys = level.box_keys
+        self.player_keys = level.player_keys
+        # Pushes needed to get a box from each cell onto each goal, the level's pull search from one goal at a time
+        self.distances = [level.find_pull_distances([goal]) for goal in level.goal_cells]
+
+    def heuristic(self, boxes):
+        '''
+        Matches boxes to goals greedily, closest pairs first, and adds up the push distances
+        Only as many boxes as there are goals need to end up on one, so spare boxes are left unmatched
+        '''
+        pairs = sorted((pulls[box], goal, box) for goal, pulls in enumerate(self.distances)
+                       for box in boxes if pulls[box] != UNREACHABLE)
+        used_goals = set()
+        used_boxes = set()
+        total = 0
+        for distance, goal, box in pairs:
+            if goal not in used_goals and box not in used_boxes:
+                used_goals.add(goal)
+                used_boxes.add(box)
+                total += distance
+        if len(used_goals) < self.goal_count:
+            # Greedy matching can miss a full matching that exists, so check properly before giving up
+            if not self.can_cover_goals(boxes):
+                return None
+            for goal, pulls in enumerate(self.distances):
+                if goal not in used_goals:
+                    total += min(pulls[box] for box in boxes if pulls[box] != UNREACHABLE)
+        return total
+
+    def can_cover_goals(self, boxes):
+        # Finds a box for every goal with augmenting paths, so the level is not wrongly thought dead
+        goal_boxes = {}
+
+        def assign(goal, tried):
+            for box in boxes:
+                if self.distances[goal][box] != UNREACHABLE and box not in tried:
+                    tried.add(box)
+                    if box not in goal_boxes or assign(goal_boxes[box], tried):
+                        goal_boxes[box] = goal
+                        return True
+            return False
+
+        return all(assign(goal, set()) for goal in range(0, self.goal_count))
+
+    def find_frozen(self, occupied, box):
+        '''
+        A box in a 2x2 square where every cell is a wall or a box can never be moved again
+        Returns the boxes off a goal frozen in any square with this box in it, these are lost to the level
+        A spare box can be lost without losing the level, so these are counted rather than rejected outright
+        '''
+        frozen = set()
+        for corner in (box, box - 1, box - self.level.width, box - self.level.width - 1):
+            square = (corner, corner + 1, corner + self.level.width, corner + self.level.width + 1)
+            if all(not self.walkable[cell] or occupied[cell] for cell in square):
+                frozen.update(cell for cell in square if occupied[cell] and not self.level.goals[cell])
+        return frozen
+
+    def is_solved(self, boxes):
+        return sum(self.level.goals[box] for box in boxes) == self.goal_count
+
+    def solve(self):
+        start_time = time.perf_counter()
+        start_boxes = tuple(sorted(self.level.box_starts))
+        start_h = self.heuristic(start_boxes)
+        if start_h is None:
+            return Solution(UNSOLVABLE, None, 0, time.perf_counter() - start_time)
+
+        start_hash = 0
+        for box in start_boxes:
+            start_hash ^= self.box_keys[box]
+        # Every node ever queued: (parent node, box pushed, direction pushed, boxes, player, hash of the boxes)
+        self.nodes = [(None, None, None, start_boxes, self.level.player_start, start_hash)]
+        queue = [(start_h, 0, 0)]
+        # Hashes of the boxes and the player's region of every node expanded
+        closed = set()
+        # Hashes of the boxes and exact player cell of every node queued, so the same push is not queued twice
+        queued = {start_hash ^ self.player_keys[self.level.player_start]}
+        expanded = 0
+
+        while queue:
+            cost, neg_pushes, node = heapq.heappop(queue)
+            parent, box, direction, boxes, player, box_hash = self.nodes[node]
+            occupied = bytearray(self.level.size)
+            for cell in boxes:
+                occupied[cell] = 1
+            seen, reachable = self.level.find_region(occupied, player)
+            # Positions that differ only in where the player stands in their region are the same node
+            state_hash = box_hash ^ self.player_keys[min(reachable)]
+            if state_hash in closed:
+                continue
+            closed.add(state_hash)
+
+            if self.is_solved(boxes):
+                return Solution(SOLVED, self.build_moves(node), expanded, time.perf_counter() - start_time)
+
+            expanded += 1
+            if expanded >= self.max_nodes:
+                return Solution(GAVE_UP, None, expanded, time.perf_counter() - start_time)
+            if expanded % TIME_CHECK_INTERVAL == 0 and time.perf_counter() - start_time > self.time_limit:
+                return Solution(GAVE_UP, None, expanded, time.perf_counter() - start_time)
+
+            dead_boxes = sum(self.dead[box] for box in boxes)
+            pushes = -neg_pushes + 1
+            for box in boxes:
+                for direction, step in enumerate(self.steps):
+                    target = box + step
+                    if not seen[box - step] or not self.walkable[target] or occupied[target]:
+                        continue
+                    # Pushes onto dead cells are rejected once there are no spare boxes left to lose
+                    new_dead = dead_boxes + self.dead[target] - self.dead[box]
+                    if new_dead > self.level.spare_boxes:
+                        continue
+                    new_hash = box_hash ^ self.box_keys[box] ^ self.box_keys[target]
+                    if new_hash ^ self.player_keys[box] in queued:
+                        continue
+                    queued.add(new_hash ^ self.player_keys[box])
+                    # The push is made on the occupied cells while looking for frozen boxes, then taken back
+                    occupied[box] = 0
+                    occupied[target] = 1
+                    frozen = self.find_frozen(occupied, target)
+                    occupied[box] = 1
+                    occupied[target] = 0
+                    # Frozen boxes on dead cells are already counted as dead, so only the others are added
+                    if new_dead + sum(1 for cell in frozen if not self.dead[cell]) > self.level.spare_boxes:
+                        continue
+                    new_boxes = tuple(sorted([cell for cell in boxes if cell != box] + [target]))
+                    h = self.heuristic(new_boxes)
+                    if h is None:
+                        continue
+                    self.nodes.append((node, box, direction, new_boxes, box, new_hash))
+                    heapq.heappush(queue, (pushes + h, -pushes, len(self.nodes) - 1))
+
+        return Solution(UNSOLVABLE, None, expanded, time.perf_counter() - start_time)
+
+    def build_moves(self, node):
+        # Follow the parents back to the start to list the pushes in order
+        pushes = []
+        while self.nodes[node][0] is not None:
+            parent, box, direction, boxes, player, box_hash = self.nodes[node]
+            pushes.append((box, direction))
+            node = parent
+        pushes.reverse()
+
+        # Replay the pushes on a game state, walking the player round to each box first
+        state = GameState(self.level)
+        for box, direction in pushes:
+            for walk in self.find_path(state, box - self.steps[direction]):
+                state.move(walk)
+            state.move(direction)
+        return state.get_moves()
+
+    def find_path(self, state, target):
+        # Breadth first search for the shortest walk to the target, without pushing any boxes
+        came_from = {state.player: None}
+        frontier = [state.player]
+        for cell in frontier:
+            if cell == target:
+                break
+            for direction, step in enumerate(self.steps):
+                near = cell + step
+                if self.walkable[near] and not state.boxes[near] and near not in came_from:
+                    came_from[near] = (cell, direction)
+                    frontier.append(near)
+        path = []
+        while came_from[target] is not None:
+            target, direction = came_from[target]
+            path.append(direction)
+        path.reverse()
+        return path
+
+
+def solve_level(level, max_nodes=MAX_NODES, time_limit=TIME_LIMIT):
+    return Solver(level, max_nodes, time_limit).solve()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Solve a PySoko level')
+    parser.add_argument('level', help='level file, or an XSB/SOK pack')
+    parser.add_argument('number', nargs='?', type=int, default=1, help='level number in a pack, counting from 1')
+    parser.add_argument('--max-nodes', type=int, default=MAX_NODES, help='give up after expanding this many nodes')
+    parser.add_argument('--time-limit', type=float, default=TIME_LIMIT, help='give up after this many seconds')
+    args = parser.parse_args()
+
+    solution = solve_level(load_library_level(args.level, args.number - 1), args.max_nodes, args.time_limit)
+    print(solution)
+    print(f'{solution.nodes} nodes expanded in {solution.elapsed:.3f}s', file=sys.stderr)
+    sys.exit({SOLVED: 0, UNSOLVABLE: 1, GAVE_UP: 2}[solution.status])
@@ -0,0 +1,51 @@
+# Run with pytest
+
+import os
+import json
+import batch_solve
+from batch_solve import run_batch, check_level
+
+LEVEL_DATA = {'map': ['######', '#....#', '#.x..#', '#....#', '######'], 'player_coords': [1, 1],
+              'box_coords': [[3, 2]]}
+PACK = '; Solvable\n#####\n#@$.#\n#####\n\n; Stuck\n#####\n#$@.#\n#####\n\n; Also solvable\n######\n#@ $.#\n######\n'
+
+
+def test_levels_and_packs(tmp_path, monkeypatch):
+    # Compiled levels and pack indexes are cached under the working directory
+    monkeypatch.chdir(tmp_path)
+    levels_dir = tmp_path / 'levels'
+    levels_dir.mkdir()
+    with open(levels_dir / 'level.txt', 'w') as file:
+        json.dump(LEVEL_DATA, file)
+    with open(levels_dir / 'pack.xsb', 'w') as file:
+        file.write(PACK)
+    results_file = str(tmp_path / 'results.jsonl')
+
+    results, skipped = run_batch(str(levels_dir), results_file, jobs=2)
+    assert skipped == 0
+    assert sorted((result['file'].rsplit('/', 1)[-1], result['number'], result['status']) for result in results) \
+        == [('level.txt', 0, 'solved'), ('pack.xsb', 0, 'solved'), ('pack.xsb', 1, 'unsolvable'),
+            ('pack.xsb', 2, 'solved')]
+
+    # Nothing has changed, so every level is skipped
+    assert run_batch(str(levels_dir), results_file, jobs=2) == ([], 4)
+
+
+def crash_on_second_level(path, number, max_nodes, time_limit):
+    # Dies the way a worker killed by the OS does, without raising anything the pool could send back
+    if number == 1:
+        os._exit(1)
+    return check_level(path, number, max_nodes, time_limit)
+
+
+def test_dead_worker_only_loses_its_level(tmp_path, monkeypatch):
+    # Workers are forked, so they pick up the patched function
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(batch_solve, 'check_level', crash_on_second_level)
+    levels_dir = tmp_path / 'levels'
+    levels_dir.mkdir()
+    with open(levels_dir / 'pack.xsb', 'w') as file:
+        file.write(PACK)
+    results, skipped = run_batch(str(levels_dir), str(tmp_path / 'results.jsonl'), jobs=2)
+    assert sorted((result['number'], result['status']) for result in results) \
+        == [(0, 'solved'), (1, 'crashed'), (2, 'solved')]
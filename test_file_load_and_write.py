@@ -2,6 +2,7 @@
 
 import json
 import os
+import random
 
 class PySoko:
     pass
@@ -68,6 +69,10 @@ class Board:
         self.history = []
         self.history_offset = 1
         self.layout = [[Tile(None) for x in range(self.grid_dimensions[0])] for y in range(self.grid_dimensions[1])]
+        # Random 64 bit keys for a box and for the player on each tile, XORed together to hash a position
+        self.zobrist = random.Random('PySoko')
+        self.box_keys = [[self.zobrist.getrandbits(64) for x in row] for row in self.layout]
+        self.player_keys = [[self.zobrist.getrandbits(64) for x in row] for row in self.layout]
         self.p = Player(self.player_coords[0], self.player_coords[1])
         self.place_objs()
 
@@ -77,12 +82,22 @@ class Board:
 
     def place_objs(self):
         # Places objects on grid
+        # Goal tiles replace the tile in the layout, so they go down before anything is placed on them
+        for coord in self.gtile_coords:
+            self.layout[coord[0]][coord[1]] = Goal_Tile(None)
         for coord in self.wall_coords:
             self.layout[coord[0]][coord[1]].change_contents(Wall())
+        self.boxes = []
+        self.gtiles_covered = 0
+        self.box_hash = 0
+        self.region = None
         for coord in self.box_coords:
-            self.layout[coord[0]][coord[1]].change_contents(Box(coord[0], coord[1]))
-        for coord in self.gtile_coords:
-            self.layout[coord[0]][coord[1]] = Goal_Tile(None)
+            self.box = Box(coord[0], coord[1])
+            self.boxes.append(self.box)
+            self.layout[coord[0]][coord[1]].change_contents(self.box)
+            self.box_hash ^= self.box_keys[coord[0]][coord[1]]
+            if type(self.layout[coord[0]][coord[1]]) is Goal_Tile:
+                self.gtiles_covered += 1
         self.layout[self.player_coords[0]][self.player_coords[1]].change_contents(self.p)
 
     def move_player(self, current, new, direction, record):
@@ -101,6 +116,39 @@ class Board:
     def move_box(self, current, new, box):
         self.layout[current[0]][current[1]].change_contents(None)
         self.layout[new[0]][new[1]].change_contents(box)
+        # Only a box moving onto or off a goal tile changes how many goals are covered
+        if type(self.layout[current[0]][current[1]]) is Goal_Tile:
+            self.gtiles_covered -= 1
+        if type(self.layout[new[0]][new[1]]) is Goal_Tile:
+            self.gtiles_covered += 1
+        # Moving a box changes the hash by two XORs, and may change the region the player can walk around
+        self.box_hash ^= self.box_keys[current[0]][current[1]] ^ self.box_keys[new[0]][new[1]]
+        self.region = None
+
+    def find_region(self):
+        # The top-left most tile the player can walk to without pushing, found with a flood fill
+        self.reachable = [self.p.get_curr_pos()]
+        self.seen = {self.p.get_curr_pos()}
+        for pos in self.reachable:
+            for vector in self.p.movement_vectors:
+                self.near = (pos[0] + vector[0], pos[1] + vector[1])
+                if self.near in self.seen or not (0 <= self.near[0] < len(self.layout)) \
+                        or not (0 <= self.near[1] < len(self.layout[0])):
+                    continue
+                if self.layout[self.near[0]][self.near[1]].get_contents() is None:
+                    self.seen.add(self.near)
+                    self.reachable.append(self.near)
+        return min(self.reachable)
+
+    def get_state_hash(self):
+        '''
+        Positions where the player can walk between each other without pushing are the same position
+        The player is hashed by the top-left most tile of the region they can reach
+        This region only changes when a box moves, so it is only found again after a push
+        '''
+        if self.region is None:
+            self.region = self.find_region()
+        return self.box_hash ^ self.player_keys[self.region[0]][self.region[1]]
 
     def undo(self, offset):
         self.move_data = self.history[len(self.history) - offset]
@@ -117,16 +165,11 @@ class Board:
         self.place_objs()
 
     def events(self):
-        # Go through every box in the layout, change their valid_moves
-        self.win = True
-        for row in self.layout:
-            for tile in row:
-                if type(tile.get_contents()) is Box:
-                    tile.get_contents().update_valid_moves(self.layout)
-                # The game is won if and only if all goal tiles have box on them
-                if type(tile) is Goal_Tile and type(tile.get_contents()) is not Box:
-                    self.win = False
-        if self.win:
+        # Go through every box, change their valid_moves
+        for box in self.boxes:
+            box.update_valid_moves(self.layout)
+        # The game is won if and only if all goal tiles have box on them
+        if self.gtiles_covered == len(self.gtile_coords):
             return True
         self.p.update_valid_moves(self.layout)
         self.valid_moves = self.p.get_valid_moves()
@@ -0,0 +1,109 @@
+# Run with pytest
+
+from game_core import GameState, Level, LEFT, UP, RIGHT, DOWN, BLOCKED, MOVED, PUSHED
+
+# One goal in the middle of an open room, so only the cells along the walls are dead
+ROOM = ['#######', '#.....#', '#.x...#', '#.....#', '#######']
+
+
+def make_state(player_coords=(1, 1), box_coords=((3, 2),)):
+    return GameState(Level.from_map(ROOM, player_coords, box_coords))
+
+
+def get_position(state):
+    return state.player, bytes(state.boxes), state.goals_covered, state.dead_boxes
+
+
+def test_moves_are_logged():
+    state = make_state()
+    assert state.move(UP) == BLOCKED
+    assert state.move(DOWN) == MOVED
+    assert state.move(RIGHT) == MOVED
+    assert state.move(RIGHT) == PUSHED
+    assert state.get_moves() == 'drR'
+    assert state.get_box_coords() == [(4, 2)]
+
+
+def test_undo_and_redo():
+    state = make_state(player_coords=(5, 2))
+    start = get_position(state)
+    assert state.undo() == BLOCKED
+    state.replay('lLu')
+    assert state.is_won()
+    end = get_position(state)
+
+    assert [state.undo() for i in range(0, 3)] == [MOVED, PUSHED, MOVED]
+    assert state.undo() == BLOCKED
+    assert get_position(state) == start
+    assert state.get_moves() == ''
+
+    assert [state.redo() for i in range(0, 3)] == [MOVED, PUSHED, MOVED]
+    assert state.redo() == BLOCKED
+    assert get_position(state) == end
+    assert state.get_moves() == 'lLu'
+
+
+def test_new_move_cuts_off_undone_moves():
+    state = make_state()
+    state.replay('rrrd')
+    state.undo()
+    state.undo()
+    assert state.move(LEFT) == MOVED
+    assert state.redo() == BLOCKED
+    assert state.get_moves() == 'rrl'
+    # The undone moves are overwritten in place, the log keeps its length
+    assert len(state.history) == 4
+
+
+def test_hashes_are_unchanged_after_undo():
+    state = make_state(player_coords=(4, 2))
+    position_hash, state_hash = state.get_hash(), state.get_state_hash()
+    state.move(LEFT)
+    pushed_hash = state.get_hash()
+    assert pushed_hash != position_hash
+    state.undo()
+    assert (state.get_hash(), state.get_state_hash()) == (position_hash, state_hash)
+    state.redo()
+    assert state.get_hash() == pushed_hash
+
+
+def test_same_position_by_different_walks():
+    first = make_state()
+    first.replay('rd')
+    second = make_state()
+    second.replay('dr')
+    assert first.get_hash() == second.get_hash()
+    assert first.get_state_hash() == second.get_state_hash()
+
+
+def test_state_hash_ignores_where_player_stands_in_region():
+    near = make_state(player_coords=(1, 1))
+    far = make_state(player_coords=(5, 3))
+    assert near.get_hash() != far.get_hash()
+    assert near.get_state_hash() == far.get_state_hash()
+    # Pushing the box makes it a different position
+    far.replay('ulL')
+    assert near.get_state_hash() != far.get_state_hash()
+
+
+def test_dead_cells():
+    level = Level.from_map(ROOM, (1, 1), [(3, 2)])
+    dead = {level.coords(cell) for cell in range(0, level.size) if level.is_dead(cell)}
+    # Every floor cell along a wall is dead, as the only goal is away from the walls
+    assert dead == {(col, row) for col in range(1, 6) for row in range(1, 4) if col in (1, 5) or row in (1, 3)}
+
+
+def test_is_lost_counts_spare_boxes():
+    # Two boxes for one goal, so one box can be lost without losing the level
+    state = make_state(player_coords=(3, 1), box_coords=((3, 2), (4, 2)))
+    assert state.level.spare_boxes == 1
+    assert not state.is_dead_push(LEFT)
+    assert state.is_dead_push(DOWN)
+    state.move(DOWN)
+    assert state.dead_boxes == 1
+    assert not state.is_lost()
+    state.replay('urD')
+    assert state.dead_boxes == 2
+    assert state.is_lost()
+    state.undo()
+    assert not state.is_lost()
@@ -0,0 +1,133 @@
+# Run with pytest
+
+import os
+import json
+import pytest
+from level_library import LevelLibrary, SORT_ORDERS
+
+LEVELS = {
+    'Tiny.txt': {'map': ['####', '#x.#', '####'], 'player_coords': [2, 1], 'box_coords': [[1, 1]]},
+    'Wide.txt': {'map': ['#######', '#.x.x.#', '#######'], 'player_coords': [1, 1], 'box_coords': [[3, 1], [5, 1]]},
+}
+# Titles with the characters LIKE treats as wildcards
+PACK = ''.join(f'; {title}\n#####\n#@$.#\n#####\n\n' for title in ('100% done', 'a_b', 'axb'))
+
+# Every valid level, by name, with the order each sort should give them in
+ORDERS = {
+    'name': ['100% done', 'a_b', 'axb', 'Tiny', 'Wide'],
+    'size': ['Tiny', '100% done', 'a_b', 'axb', 'Wide'],
+    'boxes': ['100% done', 'a_b', 'axb', 'Tiny', 'Wide'],
+    'best': ['Wide', 'axb', '100% done', 'a_b', 'Tiny'],
+}
+
+
+@pytest.fixture
+def levels_dir(tmp_path, monkeypatch):
+    # Compiled levels and pack indexes are cached under the working directory
+    monkeypatch.chdir(tmp_path)
+    levels_dir = tmp_path / 'levels'
+    levels_dir.mkdir()
+    for name, level_data in LEVELS.items():
+        with open(levels_dir / name, 'w') as file:
+            json.dump(level_data, file)
+    with open(levels_dir / 'pack.xsb', 'w') as file:
+        file.write(PACK)
+    with open(levels_dir / 'broken.txt', 'w') as file:
+        file.write('{')
+    return str(levels_dir)
+
+
+@pytest.fixture
+def library(tmp_path, levels_dir):
+    library = LevelLibrary(str(tmp_path / 'library.db'))
+    library.scan(levels_dir)
+    yield library
+    library.close()
+
+
+def get_names(rows):
+    return [row['name'] for row in rows]
+
+
+def test_rescan_only_reads_changed_files(library, levels_dir, monkeypatch):
+    read = []
+    get_level_rows = LevelLibrary.get_level_rows
+
+    def count_reads(self, file, stat):
+        read.append(os.path.basename(file))
+        return get_level_rows(self, file, stat)
+
+    monkeypatch.setattr(LevelLibrary, 'get_level_rows', count_reads)
+    assert library.scan(levels_dir) == 0
+    assert read == []
+
+    os.utime(os.path.join(levels_dir, 'Tiny.txt'), ns=(5, 5))
+    with open(os.path.join(levels_dir, 'pack.xsb'), 'a') as file:
+        file.write('; Extra\n#####\n#@$.#\n#####\n')
+    assert library.scan(levels_dir) == 2
+    assert sorted(read) == ['Tiny.txt', 'pack.xsb']
+    assert library.count() == 6
+
+
+def test_deleted_files_are_dropped(library, levels_dir):
+    os.remove(os.path.join(levels_dir, 'pack.xsb'))
+    os.remove(os.path.join(levels_dir, 'broken.txt'))
+    assert library.scan(levels_dir) == 0
+    assert get_names(library.query()) == ['Tiny', 'Wide']
+    assert library.db.execute('SELECT COUNT(*) FROM levels').fetchone()[0] == 2
+
+
+def test_scores_survive_rescan(library, levels_dir):
+    wide = os.path.join(levels_dir, 'Wide.txt')
+    library.record_score(wide, 0, 10, 2)
+    os.utime(wide, ns=(5, 5))
+    assert library.scan(levels_dir) == 1
+    assert [(row['name'], row['best_moves'], row['best_pushes']) for row in library.query(solved=True)] \
+        == [('Wide', 10, 2)]
+
+
+def test_only_better_scores_are_kept(library, levels_dir):
+    pack = os.path.join(levels_dir, 'pack.xsb')
+
+    def best():
+        row = library.query('axb')[0]
+        return row['best_moves'], row['best_pushes']
+
+    library.record_score(pack, 2, 40, 10)
+    library.record_score(pack, 2, 50, 1)
+    assert best() == (40, 10)
+    # Fewer pushes break a tie on moves
+    library.record_score(pack, 2, 40, 12)
+    library.record_score(pack, 2, 40, 5)
+    assert best() == (40, 5)
+    library.record_score(pack, 2, 33, 9)
+    assert best() == (33, 9)
+
+
+@pytest.mark.parametrize('search, names', [
+    ('%', ['100% done']),
+    ('_', ['a_b']),
+    ('a_b', ['a_b']),
+    ('A', ['a_b', 'axb']),
+    ('', ORDERS['name']),
+])
+def test_search_is_literal(library, search, names):
+    assert get_names(library.query(search)) == names
+    assert library.count(search) == len(names)
+
+
+@pytest.mark.parametrize('sort', SORT_ORDERS)
+def test_sort_orders_and_pages(library, levels_dir, sort):
+    library.record_score(os.path.join(levels_dir, 'Wide.txt'), 0, 10, 2)
+    library.record_score(os.path.join(levels_dir, 'pack.xsb'), 2, 30, 4)
+    order = ORDERS[sort]
+    assert get_names(library.query(sort=sort)) == order
+    assert get_names(library.query(sort=sort, offset=1, limit=2)) == order[1:3]
+    assert get_names(library.query(sort=sort, offset=4, limit=2)) == order[4:]
+    assert get_names(library.query(sort=sort, descending=True, limit=2)) == order[::-1][0:2]
+
+
+def test_solved_filter(library, levels_dir):
+    library.record_score(os.path.join(levels_dir, 'Wide.txt'), 0, 10, 2)
+    assert get_names(library.query(solved=True)) == ['Wide']
+    assert library.count(solved=False) == 4
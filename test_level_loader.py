@@ -0,0 +1,75 @@
+# Run with pytest
+
+import os
+import json
+import pytest
+from level_loader import load_level, level_from_data, get_cache_file
+
+LEVEL_DATA = {'map': ['######', '#....#', '#.x..#', '#....#', '######'], 'player_coords': [1, 1],
+              'box_coords': [[3, 2]]}
+
+
+def write_level(path, level_data):
+    with open(path, 'w') as file:
+        json.dump(level_data, file)
+    return str(path)
+
+
+def test_compiled_level_matches_parsed(tmp_path):
+    path = write_level(tmp_path / 'level.txt', LEVEL_DATA)
+    cache_dir = str(tmp_path / 'cache')
+    parsed = load_level(path, cache_dir)
+    assert os.path.exists(get_cache_file(path, cache_dir))
+    compiled = load_level(path, cache_dir)
+    assert (compiled.cols, compiled.rows) == (parsed.cols, parsed.rows)
+    assert compiled.cells == parsed.cells
+    assert compiled.player_start == parsed.player_start
+    assert compiled.box_starts == parsed.box_starts
+    assert compiled.dead == parsed.dead
+
+
+def test_changed_level_is_parsed_again(tmp_path):
+    path = write_level(tmp_path / 'level.txt', LEVEL_DATA)
+    cache_dir = str(tmp_path / 'cache')
+    load_level(path, cache_dir)
+    write_level(path, dict(LEVEL_DATA, box_coords=[[2, 1], [3, 2]]))
+    assert len(load_level(path, cache_dir).box_starts) == 2
+
+
+WALLS = [[col, row] for row in range(0, 4) for col in range(0, 4) if row in (0, 3) or col in (0, 3)]
+EDITOR_DATA = {'grid_dim': 4, 'player_coords': [[1, 1]], 'box_coords': [[2, 1]], 'wall_coords': WALLS,
+               'goal_tile_coords': [[2, 2]]}
+TEXT_DATA = {'grid_dimensions': [4, 4], 'player_coords': [1, 1], 'box_coords': [[1, 2]],
+             'wall_coords': [coords[::-1] for coords in WALLS], 'gtile_coords': [[2, 2]]}
+
+
+@pytest.mark.parametrize('level_data, grid', [
+    (dict(LEVEL_DATA, player_coords=[0, -5]), '6x5'),
+    (dict(LEVEL_DATA, box_coords=[[-1, 2]]), '6x5'),
+    (dict(LEVEL_DATA, box_coords=[[9, 1]]), '6x5'),
+    (dict(LEVEL_DATA, player_coords=[6, 1]), '6x5'),
+    # Without the check, this goal would wrap onto (3, 1) and this wall onto (0, 2)
+    (dict(EDITOR_DATA, goal_tile_coords=[[-1, 2]]), '4x4'),
+    (dict(EDITOR_DATA, wall_coords=WALLS + [[4, 1]]), '4x4'),
+    (dict(TEXT_DATA, gtile_coords=[[2, 4]]), '4x4'),
+    (dict(TEXT_DATA, wall_coords=[[-1, 0]]), '4x4'),
+])
+def test_off_grid_coordinates_are_rejected(tmp_path, level_data, grid):
+    with pytest.raises(ValueError, match=f'off the {grid} grid'):
+        level_from_data(level_data)
+    path = write_level(tmp_path / 'level.txt', level_data)
+    with pytest.raises(ValueError):
+        load_level(path, str(tmp_path / 'cache'))
+
+
+def test_formats_give_the_same_level():
+    editor = level_from_data(EDITOR_DATA)
+    text = level_from_data(TEXT_DATA)
+    assert editor.cells == text.cells
+    assert editor.player_start == text.player_start
+    assert editor.box_starts == text.box_starts
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        level_from_data({'grid': []})
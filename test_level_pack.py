@@ -0,0 +1,79 @@
+# Run with pytest
+
+import os
+import pytest
+from game_core import VOID, FLOOR, WALL
+from level_pack import LevelPack, parse_xsb
+
+LEVEL = '#####\n#@$.#\n#####\n'
+# Titles after each level, as in SOK files
+TITLES_AFTER = '; A pack\n\n' + ''.join(f'{LEVEL}Title: Level {number}\n\n' for number in range(1, 4))
+# Titles before each level, as comments
+TITLES_BEFORE = ''.join(f'; Level {number}\n{LEVEL}\n' for number in range(1, 4))
+
+
+def write_pack(path, text):
+    with open(path, 'w', newline='') as file:
+        file.write(text)
+    return str(path)
+
+
+@pytest.mark.parametrize('text', [TITLES_AFTER, TITLES_BEFORE])
+def test_titles(tmp_path, text):
+    with LevelPack(write_pack(tmp_path / 'pack.xsb', text), None) as pack:
+        assert len(pack) == 3
+        assert [pack.get_title(number) for number in range(0, 3)] == ['Level 1', 'Level 2', 'Level 3']
+
+
+def test_untitled_levels_are_numbered(tmp_path):
+    with LevelPack(write_pack(tmp_path / 'pack.xsb', f'{LEVEL}\n{LEVEL}'), None) as pack:
+        assert [pack.get_title(number) for number in range(0, 2)] == ['Level 1', 'Level 2']
+
+
+def test_saved_index_matches_built(tmp_path):
+    path = write_pack(tmp_path / 'pack.sok', TITLES_AFTER.replace('\n', '\r\n'))
+    cache_dir = str(tmp_path / 'cache')
+    with LevelPack(path, cache_dir) as pack:
+        built = pack.offsets
+    assert os.listdir(cache_dir)
+    with LevelPack(path, cache_dir) as pack:
+        assert pack.read_index() == built
+        assert pack.offsets == built
+        level = pack[2]
+    assert (level.cols, level.rows) == (5, 3)
+    assert level.name == 'Level 3'
+
+
+def test_changed_pack_is_indexed_again(tmp_path):
+    path = write_pack(tmp_path / 'pack.xsb', TITLES_BEFORE)
+    cache_dir = str(tmp_path / 'cache')
+    with LevelPack(path, cache_dir) as pack:
+        assert len(pack) == 3
+    write_pack(path, TITLES_BEFORE + f'; Level 4\n{LEVEL}')
+    with LevelPack(path, cache_dir) as pack:
+        assert len(pack) == 4
+
+
+def test_missing_level(tmp_path):
+    with LevelPack(write_pack(tmp_path / 'pack.xsb', LEVEL), None) as pack:
+        with pytest.raises(IndexError):
+            pack[1]
+
+
+def test_empty_pack(tmp_path):
+    with LevelPack(write_pack(tmp_path / 'pack.xsb', ''), None) as pack:
+        assert len(pack) == 0
+
+
+def test_outside_spaces_are_void():
+    level = parse_xsb('  ###\n###.#\n#@$ #\n#####')
+    assert level.get_cell(0, 0) == VOID
+    assert level.get_cell(3, 2) == FLOOR
+    assert level.get_cell(2, 0) == WALL
+    assert level.coords(level.player_start) == (1, 2)
+    assert [level.coords(box) for box in level.box_starts] == [(2, 2)]
+
+
+def test_level_without_player():
+    with pytest.raises(ValueError):
+        parse_xsb('#####\n# $.#\n#####')
@@ -0,0 +1,106 @@
+# Run with pytest
+
+import os
+import json
+import pytest
+from level_loader import load_level, level_from_data
+from level_validator import validate_data, validate_all, check_level
+from level_pack import parse_xsb
+
+WALLS = [[col, row] for row in range(0, 6) for col in range(0, 6) if row in (0, 5) or col in (0, 5)]
+VALID = {'grid_dim': 6, 'player_coords': [[1, 1]], 'box_coords': [[2, 2]], 'wall_coords': WALLS,
+         'goal_tile_coords': [[3, 3]]}
+
+
+def problems(**changes):
+    return validate_data(dict(VALID, **changes))
+
+
+def test_valid_level():
+    assert problems() == []
+
+
+def test_open_level():
+    assert 'not closed off by walls' in problems(wall_coords=[coords for coords in WALLS if coords != [3, 0]])[0]
+
+
+def test_open_level_can_be_played():
+    # Void stops the player in play, so only saving needs the level closed off
+    open_level = dict(VALID, wall_coords=[coords for coords in WALLS if coords != [3, 0]])
+    assert validate_data(open_level) != []
+    check_level(level_from_data(open_level), closed=False)
+    with pytest.raises(ValueError):
+        check_level(level_from_data(dict(open_level, goal_tile_coords=[[2, 2]])), closed=False)
+
+
+def test_shipped_levels_can_be_played():
+    levels_dir = os.path.join(os.path.dirname(__file__), 'levels')
+    for name in sorted(os.listdir(levels_dir)):
+        check_level(load_level(os.path.join(levels_dir, name), None), closed=False)
+
+
+def test_corner_gap_is_still_closed():
+    # The player cannot walk diagonally, so a missing corner does not open the level
+    assert problems(wall_coords=[coords for coords in WALLS if coords != [0, 0]]) == []
+
+
+def test_already_completed():
+    assert problems(goal_tile_coords=[[2, 2]]) == ['level is already completed']
+
+
+def test_no_goals():
+    assert problems(goal_tile_coords=[]) == ['level has no goals']
+
+
+def test_fewer_boxes_than_goals():
+    assert '1 boxes for 2 goals' in problems(goal_tile_coords=[[3, 3], [3, 2]])
+
+
+def test_unreachable_box_and_goal():
+    found = problems(wall_coords=WALLS + [[3, 1], [3, 2], [3, 3], [3, 4]], box_coords=[[4, 2]],
+                     goal_tile_coords=[[4, 3]])
+    assert '1 boxes the player can never get to' in found
+    assert '1 goals the player can never get to' in found
+
+
+def test_player_on_wall():
+    assert problems(player_coords=[[0, 0]]) == ['player is on a wall or void at (0, 0)']
+
+
+@pytest.mark.parametrize('changes', [
+    {'box_coords': [[9, 1]]},
+    {'box_coords': [[-3, 1]]},
+    {'player_coords': [[1, -5]]},
+    {'player_coords': [[6, 1]]},
+])
+def test_off_grid_coordinates(changes):
+    # Off the grid coordinates must not wrap onto another row, where they could look like a valid cell
+    found = problems(**changes)
+    assert len(found) == 1 and 'off the 6x6 grid' in found[0]
+
+
+def test_not_a_level():
+    assert problems(player_coords=[])[0].startswith('not a level')
+
+
+def test_check_level_raises():
+    level = parse_xsb('#####\n#@$.#\n#####')
+    check_level(level)
+    with pytest.raises(ValueError):
+        check_level(parse_xsb('#####\n#@ *#\n#####'))
+
+
+def test_validate_directory_and_pack(tmp_path, monkeypatch):
+    # Compiled levels and pack indexes are cached under the working directory, in the workers as well
+    monkeypatch.chdir(tmp_path)
+    with open(tmp_path / 'good.txt', 'w') as file:
+        json.dump(VALID, file)
+    with open(tmp_path / 'bad.txt', 'w') as file:
+        json.dump(dict(VALID, box_coords=[[9, 1]]), file)
+    with open(tmp_path / 'pack.xsb', 'w') as file:
+        file.write(''.join(f'; Level {number}\n#####\n#@$.#\n#####\n\n' for number in range(0, 5))
+                   + '; Done\n#####\n#@ *#\n#####\n')
+    results = validate_all(str(tmp_path), jobs=2, chunk_size=2)
+    assert [(result['file'].rsplit('/', 1)[-1], result['number'], bool(result['problems'])) for result in results] \
+        == [('bad.txt', 0, True), ('good.txt', 0, False)] + [('pack.xsb', number, number == 5)
+                                                              for number in range(0, 6)]
@@ -0,0 +1,33 @@
+# Run with pytest
+
+from game_core import GameState, Level
+from solver import solve_level, SOLVED, UNSOLVABLE
+
+
+def check_solution(level, solution):
+    assert solution.status == SOLVED
+    state = GameState(level)
+    assert state.replay(solution.moves)
+    assert state.is_won()
+
+
+def test_solves_level():
+    level = Level.from_map(['######', '#....#', '#.x..#', '#....#', '######'], (1, 1), [(3, 2)])
+    check_solution(level, solve_level(level))
+
+
+def test_spare_box_frozen_off_goal():
+    # The box at (1, 2) is frozen in the corner once the other is pushed, but it is spare, so the level is solvable
+    level = Level.from_map(['#######', '#x...##', '#.....#', '#.....#', '#######'], (3, 3), [(1, 2), (2, 1)])
+    check_solution(level, solve_level(level))
+
+
+def test_frozen_box_without_spare():
+    # The only box starts frozen in a corner off the goal
+    level = Level.from_map(['#####', '#...#', '#.x.#', '#...#', '#####'], (2, 1), [(1, 1)])
+    assert solve_level(level).status == UNSOLVABLE
+
+
+def test_unsolvable_without_enough_boxes():
+    level = Level.from_map(['######', '#x..x#', '#....#', '######'], (2, 2), [(2, 1)])
+    assert solve_level(level).status == UNSOLVABLE
@@ -3,13 +3,23 @@
 import pygame as pg
 import os
 import math
-import json
+import threading
+from collections import OrderedDict
+from game_core import GameState, FLOOR, GOAL, WALL, LEFT, UP, RIGHT, DOWN, PUSHED
+from assets import ASSETS, get_sprite
+from level_library import LevelLibrary, load_library_level, LEVELS_DIR, SORT_ORDERS
+from level_pack import is_pack
+from level_validator import check_level
+from scenes import Scene, SceneManager
+from previews import PreviewLoader, PREVIEW_READY
+from create_level import Editor
 
 '''
 Conditions for a valid level:
 - Closed off by walls
 - Must not be completed (at least one goal tile uncovered)
 - Number of boxes >= number of goal tiles
+These are checked by level_validator.py before the editor saves a level, and all but the first before one is played
 '''
 
 # Colours
@@ -26,10 +36,23 @@ FPS = 30
 
 # Screen and Board dimension constants
 SCREEN_DIMS = (800, 600)
+# The window can be resized, the game screen lays itself out again to fit
+WINDOW_FLAGS = pg.RESIZABLE
 BOARD_OFFSET = (10, 10)
 
 SCROLL_SPD = 10
 
+# How many rendered level names are kept for reuse
+TEXT_CACHE_SIZE = 256
+# Orders the menu can sort levels in, Tab moves on to the next
+SORT_NAMES = list(SORT_ORDERS)
+
+# Posted by the worker preparing a level each time it moves on to its next stage, and once it is done
+LEVEL_LOADING = PREVIEW_READY + 1
+# Size of the progress bar shown while a level is prepared, and the width of the block that sweeps along it
+LOADING_BAR_DIMS = (400, 30)
+LOADING_SWEEP_WIDTH = 60
+
 # Button dimensions and positioning
 GAME_BUTTON_SIZE = (80, 80)
 # Main Menu
@@ -39,8 +62,15 @@ LEVEL_SELECT_DIMS = (400, 450)
 LEVEL_BUTTON_DIMS = (360, 100)
 LEVEL_BUTTON_OFFSET = (20, 20)
 LEVEL_BUTTON_TEXT_OFFSET = (10, 10)
+# Size and box count of the level, and its best score once solved, are written beside the option buttons
+LEVEL_BUTTON_INFO_OFFSET = (170, 50)
+LEVEL_BUTTON_BEST_OFFSET = (170, 74)
+# Distance from the top of one level button to the next, and how many buttons can be in view at once
+LEVEL_ROW_HEIGHT = LEVEL_BUTTON_DIMS[1] + LEVEL_BUTTON_OFFSET[1]
+LEVEL_BUTTON_POOL_SIZE = LEVEL_SELECT_DIMS[1] // LEVEL_ROW_HEIGHT + 2
 PREVIEW_DIMS = (340, 340)
 PREVIEW_OFFSET = (440, 25)
+PREVIEW_TEXT_OFFSET = (20, 20)
 # Game Screen buttons
 UNDO_DIMS = (SCREEN_DIMS[0]*0.84, SCREEN_DIMS[1]*(1/7), GAME_BUTTON_SIZE[0], GAME_BUTTON_SIZE[1])
 RESTART_DIMS = (SCREEN_DIMS[0]*0.84, SCREEN_DIMS[1]*(3/7), GAME_BUTTON_SIZE[0], GAME_BUTTON_SIZE[1])
@@ -49,134 +79,243 @@ QUIT_DIMS = (SCREEN_DIMS[0]*0.84, SCREEN_DIMS[1]*(5/7), GAME_BUTTON_SIZE[0], GAM
 # The size of the board depends on how large the screen is
 BOARDW = SCREEN_DIMS[0] / 1.3
 BOARDH = SCREEN_DIMS[1] - (BOARD_OFFSET[0]*2)
+# Tiles are never drawn smaller than this, larger levels are shown through a viewport that follows the player
+MIN_TILE_SIZE = 32
+# How close in cells the player can get to the edge of the viewport before it scrolls
+CAMERA_MARGIN = 3
+
+# Colours used to draw level preview thumbnails
+PREVIEW_COLOURS = {'background': BLACK, 'tile': TILE_COLOUR, 'goal_tile': GTILE_COLOUR, 'wall': WALL_COLOUR,
+                   'box': BOX_COLOUR, 'player': PLAYER_COLOUR}
+
+# Image drawn for each type of cell in the board's background
+CELL_IMAGES = {FLOOR: 'tile.png', GOAL: 'goal_tile.png', WALL: 'wall.png'}
+# Images drawn over the background for the player and every box
+PLAYER_SPRITE = 'player.png'
+BOX_SPRITE = 'box.png'
+
+# Arrow keys and the direction the game core moves the player in for each
+KEY_DIRECTIONS = {pg.K_LEFT: LEFT, pg.K_UP: UP, pg.K_RIGHT: RIGHT, pg.K_DOWN: DOWN}
 
 # Instead of the original layout, every button for a level will have a delete, edit and leaderboard icon on it
 # These icons do the appropriate actions for their level
 
 
-class MainMenu:
+class MainMenu(Scene):
 
-    def __init__(self):
-        pg.init()
-        pg.display.set_caption('PySoko')
-        self.screen = pg.display.set_mode(SCREEN_DIMS)
-        self.screen.fill(SCREEN_COLOUR)
-        self.clock = pg.time.Clock()
-        self.done = False
+    '''
+    Levels are listed from the level library, which is brought up to date every time the menu is shown
+    Typing filters the list by name, Tab changes the order it is sorted in
+    Only the page of levels in view is read from the library, however many levels there are
+    '''
+
+    def __init__(self, manager):
+        super().__init__(manager)
+        self.mouse_point = (0, 0)
 
         self.selected = None
 
+        self.library = LevelLibrary()
+        self.search = ''
+        self.sort = 'name'
+        self.level_count = 0
+        self.page_key = None
+        self.page = []
+
         self.scroll_offset = 0
         self.max_scroll_offset = -430
 
+        # One font and one cache of rendered names are shared by every level button
+        self.level_font = pg.font.SysFont('Times New Roman', 24)
+        self.text_cache = TextCache(self.level_font, BLACK)
+
+        self.levels = []
         self.level_buttons_group = pg.sprite.Group()
-        self.level_buttons = []
+        self.level_buttons = [LevelButton(self.text_cache) for i in range(0, LEVEL_BUTTON_POOL_SIZE)]
         self.menu_buttons_group = pg.sprite.Group()
 
         self.level_select = GameSprite(20, 20, 400, 450)
         self.preview = pg.Surface(PREVIEW_DIMS)
+        # Thumbnails are made on a background thread, a placeholder is shown until they are ready
+        self.previews = PreviewLoader(PREVIEW_DIMS, PREVIEW_COLOURS)
+        self.preview_font = pg.font.Font(None, 28)
         self.create_b = GameSprite(20, 480, 400, 100)
         self.play_b = GameSprite(440, 375, 340, 200)
         self.menu_buttons_group.add(self.level_select, self.create_b, self.play_b)
 
-        self.make_level_buttons()
-
-        self.menu_mainloop()
+    def enter(self):
+        # Levels may have been added, changed or solved since the menu was last shown
+        self.library.scan(LEVELS_DIR)
+        self.update_levels()
+        super().enter()
 
-    def get_levels(self):
-        return os.listdir('./levels')
+    def update_caption(self):
+        self.caption = f'PySoko - {self.level_count} levels by {self.sort}'
+        if self.search:
+            self.caption += f" matching '{self.search}'"
+        pg.display.set_caption(self.caption)
 
     def make_level_buttons(self):
-        self.level_select.image.fill(BLACK)
-        self.level_buttons_group = pg.sprite.Group()
-        self.level_buttons = []
+        '''
+        The level list is virtualised: only the rows in view have a button, taken from a small pool
+        While scrolling, buttons that leave the view are reused for the rows coming into it
+        '''
         self.scroll_offset = 0
-        self.max_scroll_offset = -430
-        for numb, level in enumerate(self.get_levels()):
-            self.button = LevelButton(numb, level)
-            self.level_buttons_group.add(self.button)
-            self.level_buttons.append(self.button)
-            self.max_scroll_offset += LEVEL_BUTTON_DIMS[1] + 20
+        self.update_levels()
+
+    def update_levels(self):
+        self.page_key = None
+        self.level_count = self.library.count(self.search)
+        # Keep the list scrolled within bounds if it has got shorter
+        self.update_max_scroll()
+        self.scroll_offset = min(0, max(self.scroll_offset, -max(self.max_scroll_offset, 0)))
+        self.place_level_buttons()
+        self.update_caption()
+
+    def update_max_scroll(self):
+        self.max_scroll_offset = -430 + self.level_count * LEVEL_ROW_HEIGHT
+
+    def place_level_buttons(self):
+        self.first_row = -self.scroll_offset // LEVEL_ROW_HEIGHT
+        self.level_buttons_group.empty()
+        # The page in view is only read again once scrolling brings a different row to the top
+        if self.page_key != (self.first_row, self.search, self.sort):
+            self.page_key = (self.first_row, self.search, self.sort)
+            self.page = self.library.query(self.search, sort=self.sort, offset=self.first_row,
+                                           limit=LEVEL_BUTTON_POOL_SIZE)
+        for row, level in enumerate(self.page, self.first_row):
+            # Each row keeps the same button while it is in view, so it is only redrawn when it comes into view
+            button = self.level_buttons[row % LEVEL_BUTTON_POOL_SIZE]
+            button.set_level(row, level)
+            button.set_scroll(self.scroll_offset)
+            self.level_buttons_group.add(button)
+        self.level_select.image.fill(BLACK)
         self.level_buttons_group.draw(self.level_select.image)
 
+    def delete_level(self, level):
+        if is_pack(level['file']):
+            print('Levels in a pack cannot be deleted on their own')
+            return
+        os.unlink(level['file'])
+        self.library.remove(level['file'])
+        if self.selected and self.selected['file'] == level['file']:
+            self.selected = None
+        self.update_levels()
+
+    def set_search(self, search):
+        self.search = search
+        self.make_level_buttons()
+
     def scroll_menu(self, dir):
         if -self.max_scroll_offset <= (self.scroll_offset + SCROLL_SPD * dir) <= 0:
-            self.level_select.image.fill(BLACK)
-            self.level_buttons_group.update(dir)
-            # Draw sprites onto the empty surface immediately after update to avoid flicker
             self.scroll_offset += SCROLL_SPD * dir
-        self.level_buttons_group.draw(self.level_select.image)
+            # Draw sprites onto the empty surface immediately after moving them to avoid flicker
+            self.place_level_buttons()
+
+    def draw_preview(self):
+        self.preview.fill(BLACK)
+        if self.selected:
+            self.thumbnail = self.previews.get(self.selected['file'], self.selected['number'])
+            if self.thumbnail:
+                self.preview.blit(self.thumbnail, (0, 0))
+            else:
+                self.preview.blit(self.preview_font.render('Loading preview...', True, LEVEL_BUTTON_COLOUR),
+                                  PREVIEW_TEXT_OFFSET)
 
     def localise_pos_level_select(self, pos):
         return pos[0] - 20, pos[1] - 20
 
-    def menu_mainloop(self):
-
-        while not self.done:
-
-            self.clock.tick(FPS)
-
-            for event in pg.event.get():
-                if event.type == pg.MOUSEMOTION:
-                    self.mouse_point = event.pos
-                if event.type == pg.QUIT:
-                    self.done = True
-                if event.type == pg.MOUSEWHEEL:
-                    if self.level_select.rect.collidepoint(self.mouse_point):
-                        self.scroll_menu(event.y)
-                if event.type == pg.MOUSEBUTTONDOWN:
-                    # '1' indicates a left click
-                    if event.button == 1:
-                        if self.level_select.rect.collidepoint(self.mouse_point):
-                            # Make the mouse position be relative to the level_select sprite
-                            self.local_pos = self.localise_pos_level_select(self.mouse_point)
-                            for button in self.level_buttons:
-                                if button.rect.collidepoint(self.local_pos):
-                                    self.selected = button
-                                    # Make the mouse position be relative to the button selected
-                                    self.button_local_pos = button.localise_pos(self.local_pos)
-                                    if button.check_option_pressed(self.button_local_pos):
-                                        self.option_pos = button.check_option_pressed(self.button_local_pos).rect.x
-                                        if self.option_pos == 10:
-                                            os.unlink(f'./levels/{button.filename}')
-                                            self.make_level_buttons()
-                                        elif self.option_pos == 60:
-                                            print('Edit')
-                                        elif self.option_pos == 110:
-                                            print('Leader')
-                        if self.create_b.rect.collidepoint(self.mouse_point):
-                            self.create = Edit()
-                            pg.display.set_caption('PySoko')
-                        if self.play_b.rect.collidepoint(self.mouse_point) and self.selected:
-                            self.game = Game(self.selected.get_filename(), self.selected.get_display_name())
-                            pg.display.set_caption('PySoko')
-
-            self.screen.fill(SCREEN_COLOUR)
-
-            self.screen.blit(self.preview, PREVIEW_OFFSET)
-
-            self.menu_buttons_group.draw(self.screen)
-            self.level_buttons_group.draw(self.level_select.image)
-
-            pg.display.flip()
-
-        pg.quit()
+    def draw(self):
+        self.screen.fill(SCREEN_COLOUR)
+
+        self.draw_preview()
+        self.screen.blit(self.preview, PREVIEW_OFFSET)
+
+        self.level_buttons_group.draw(self.level_select.image)
+        self.menu_buttons_group.draw(self.screen)
+
+        pg.display.flip()
+
+    def handle_event(self, event):
+        super().handle_event(event)
+        if event.type == pg.MOUSEMOTION:
+            self.mouse_point = event.pos
+        if event.type == pg.KEYDOWN:
+            if event.key == pg.K_TAB:
+                self.sort = SORT_NAMES[(SORT_NAMES.index(self.sort) + 1) % len(SORT_NAMES)]
+                self.make_level_buttons()
+            elif event.key == pg.K_BACKSPACE:
+                self.set_search(self.search[:-1])
+            elif event.unicode.isprintable() and event.unicode:
+                self.set_search(self.search + event.unicode)
+        if event.type == pg.MOUSEWHEEL:
+            if self.level_select.rect.collidepoint(self.mouse_point):
+                self.scroll_menu(event.y)
+        if event.type == pg.MOUSEBUTTONDOWN:
+            # '1' indicates a left click
+            if event.button == 1:
+                self.mouse_point = event.pos
+                if self.level_select.rect.collidepoint(self.mouse_point):
+                    # Make the mouse position be relative to the level_select sprite
+                    self.local_pos = self.localise_pos_level_select(self.mouse_point)
+                    for button in self.level_buttons_group:
+                        if button.rect.collidepoint(self.local_pos):
+                            self.selected = button.get_level()
+                            # Make the mouse position be relative to the button selected
+                            self.button_local_pos = button.localise_pos(self.local_pos)
+                            if button.check_option_pressed(self.button_local_pos):
+                                self.option_pos = button.check_option_pressed(self.button_local_pos).rect.x
+                                if self.option_pos == 10:
+                                    self.delete_level(button.get_level())
+                                    break
+                                elif self.option_pos == 60:
+                                    print('Edit')
+                                elif self.option_pos == 110:
+                                    print('Leader')
+                if self.create_b.rect.collidepoint(self.mouse_point):
+                    self.manager.push(Editor(self.manager, None))
+                if self.play_b.rect.collidepoint(self.mouse_point) and self.selected:
+                    self.manager.push(LoadingScene(self.manager, self.selected['file'], self.selected['number'],
+                                                   self.selected['name'], self.library))
+
+
+def get_board_dims(screen_dims):
+    # The board takes the same share of the window at any size, BOARDW and BOARDH are its share of SCREEN_DIMS
+    return max(1, screen_dims[0] / 1.3), max(1, screen_dims[1] - (BOARD_OFFSET[0]*2))
+
+
+class TextCache:
+
+    '''
+    Rendering text is slow compared to blitting it, so rendered names are kept for reuse
+    Only the most recently used are kept, so scrolling through thousands of levels does not grow it forever
+    '''
+
+    def __init__(self, font, colour, max_size=TEXT_CACHE_SIZE):
+        self.font = font
+        self.colour = colour
+        self.max_size = max_size
+        self.rendered = OrderedDict()
+
+    def render(self, text):
+        if text in self.rendered:
+            self.rendered.move_to_end(text)
+        else:
+            self.rendered[text] = self.font.render(text, True, self.colour)
+            if len(self.rendered) > self.max_size:
+                self.rendered.popitem(last=False)
+        return self.rendered[text]
 
 
 class LevelButton(pg.sprite.Sprite):
 
-    def __init__(self, row, filename):
+    def __init__(self, text_cache):
         super().__init__()
         # Level button appearence
         self.image = pg.Surface(LEVEL_BUTTON_DIMS)
-        self.image.fill(LEVEL_BUTTON_COLOUR)
-
-        # Draw level name of the level button
-        self.font = pg.font.SysFont('Times New Roman', 24)
-        self.filename = filename
-        self.display_name = self.display_name(self.filename)
-        self.text = self.font.render(self.display_name, True, BLACK)
-        self.image.blit(self.text, LEVEL_BUTTON_TEXT_OFFSET)
+        self.text_cache = text_cache
+        self.row = None
+        self.level = None
 
         # Option buttons for delete, edit and leaderboard for each level button
         self.option_buttons_group = pg.sprite.Group()
@@ -184,12 +323,29 @@ class LevelButton(pg.sprite.Sprite):
         self.edit_b = GameSprite(60, 50, 40, 40)
         self.leader_b = GameSprite(110, 50, 40, 40)
         self.option_buttons_group.add(self.delete_b, self.edit_b, self.leader_b)
-        self.option_buttons_group.draw(self.image)
 
         # Level button positioning
         self.rect = self.image.get_rect()
         self.rect.x = LEVEL_BUTTON_OFFSET[0]
-        self.rect.y = (row * LEVEL_BUTTON_DIMS[1]) + ((row + 1) * LEVEL_BUTTON_OFFSET[1])
+
+    def set_level(self, row, level):
+        # Buttons are reused for different rows while scrolling, they are only redrawn if their level changes
+        if row == self.row and level == self.level:
+            return
+        self.row = row
+        self.level = level
+        self.image.fill(LEVEL_BUTTON_COLOUR)
+        # Draw level name of the level button
+        self.image.blit(self.text_cache.render(self.level['name']), LEVEL_BUTTON_TEXT_OFFSET)
+        self.info = f"{self.level['cols']}x{self.level['rows']}, {self.level['boxes']} boxes"
+        self.image.blit(self.text_cache.render(self.info), LEVEL_BUTTON_INFO_OFFSET)
+        if self.level['best_moves'] is not None:
+            self.best = f"Best: {self.level['best_moves']} moves"
+            self.image.blit(self.text_cache.render(self.best), LEVEL_BUTTON_BEST_OFFSET)
+        self.option_buttons_group.draw(self.image)
+
+    def set_scroll(self, scroll_offset):
+        self.rect.y = (self.row * LEVEL_BUTTON_DIMS[1]) + ((self.row + 1) * LEVEL_BUTTON_OFFSET[1]) + scroll_offset
 
     def localise_pos(self, pos):
         return pos[0] - self.rect.x, pos[1] - self.rect.y
@@ -199,218 +355,393 @@ class LevelButton(pg.sprite.Sprite):
             if button.rect.collidepoint(pos[0], pos[1]):
                 return button
 
-    def get_display_name(self):
-        return self.display_name
-
-    def get_filename(self):
-        return self.filename
-
-    def display_name(self, filename):
-        return filename[0:len(filename)-4].replace('_', ' ')
-
-    def update(self, y):
-        self.rect.y += SCROLL_SPD * y
-
-
-class Edit:
-
-    def __init__(self, level_file=None):
-        pg.display.set_caption('Create new level')
-        self.screen = pg.display.set_mode(SCREEN_DIMS)
-        self.screen.fill(SCREEN_COLOUR)
-        self.clock = pg.time.Clock()
-        self.done = False
-
-        self.editspace = EditSpace(SCREEN_DIMS[0]/2, SCREEN_DIMS[1]/2, 400, 400)
-        self.editspace_group = pg.sprite.Group()
-        self.editspace_group.add(self.editspace)
+    def get_level(self):
+        return self.level
 
-        self.edit_mainloop()
 
-    def edit_mainloop(self):
+class Game(Scene):
 
-        while not self.done:
+    '''
+    As this is a turn-based game, there is no need to update all sprites every frame
+    Updates to variables should only happen after a valid move is made
+    Only the cells a move or undo changed are redrawn, and only those parts of the screen are updated
+    Every key press that arrived during a frame is applied to the board before it is drawn, once,
+    so holding a key down or feeding in a replay never leaves drawing behind the input
+    '''
 
-            self.clock.tick(FPS)
+    key_repeat = (400, 50)
 
-            for event in pg.event.get():
-                if event.type == pg.QUIT:
-                    self.done = True
-
-            self.editspace_group.draw(self.screen)
-
-            pg.display.flip()
-
-
-class Game:
-
-    def __init__(self, level_file, name):
-        pg.display.set_caption(name)
-        self.screen = pg.display.set_mode(SCREEN_DIMS)
-        self.screen.fill(SCREEN_COLOUR)
-        self.clock = pg.time.Clock()
-        self.done = False
-        pg.key.set_repeat(400, 50)
-
-        self.level_data = self.parse_level_data(level_file)
-        self.b = Board(self.level_data)
+    def __init__(self, manager, board, level_file, number, name, library=None):
+        super().__init__(manager)
+        self.level_file = level_file
+        self.number = number
+        self.library = library
+        self.name = name
+        self.caption = name
+        self.redraw_all = True
+        self.shown_lost = False
 
         self.game_buttons_group = pg.sprite.Group()
         self.undo_b = GameSprite(SCREEN_DIMS[0]*0.84, SCREEN_DIMS[1]*(1/7), GAME_BUTTON_SIZE[0], GAME_BUTTON_SIZE[1])
         self.restart_b = GameSprite(SCREEN_DIMS[0]*0.84, SCREEN_DIMS[1]*(3/7), GAME_BUTTON_SIZE[0], GAME_BUTTON_SIZE[1])
         self.quit_b = GameSprite(SCREEN_DIMS[0]*0.84, SCREEN_DIMS[1]*(5/7), GAME_BUTTON_SIZE[0], GAME_BUTTON_SIZE[1])
         self.game_buttons_group.add(self.undo_b, self.restart_b, self.quit_b)
+        self.layout()
+
+        # The board arrives prepared, the window may have been resized while it was, so it is fitted again
+        # A level never changes during play, so restarting builds a new board from the same one
+        self.level = board.level
+        self.b = board
+        if self.b.get_size() != tuple(map(int, self.board_dims)):
+            self.b.resize(self.board_dims)
+
+    def layout(self):
+        # Board and buttons are placed relative to the size of the window, in the same proportions at any size
+        self.screen_dims = self.screen.get_size()
+        self.board_dims = get_board_dims(self.screen_dims)
+        for button, position in ((self.undo_b, 1), (self.restart_b, 3), (self.quit_b, 5)):
+            button.rect.x = self.screen_dims[0]*0.84
+            button.rect.y = self.screen_dims[1]*(position/7)
+
+    def enter(self):
+        super().enter()
+        self.redraw_all = True
+        self.shown_lost = False
+
+    def resize(self):
+        # Only the layout changes, the board keeps its game state and sprites
+        self.layout()
+        self.b.resize(self.board_dims)
+        self.redraw_all = True
+
+    def handle_event(self, event):
+        super().handle_event(event)
+        if event.type == pg.KEYDOWN:
+            if event.key == pg.K_z:
+                self.b.undo()
+            elif event.key == pg.K_y:
+                self.b.redo()
+            elif self.b.events(event.__dict__['key']):
+                self.record_win()
+                self.manager.pop()
+        if event.type == pg.MOUSEBUTTONDOWN:
+            if event.button == 1:
+                self.mouse_point = event.pos
+                if self.undo_b.rect.collidepoint(self.mouse_point):
+                    self.b.undo()
+                if self.restart_b.rect.collidepoint(self.mouse_point):
+                    self.b = Board(self.level, self.board_dims)
+                    self.redraw_all = True
+                if self.quit_b.rect.collidepoint(self.mouse_point):
+                    self.manager.pop()
+
+    def record_win(self):
+        # The library keeps the best score for each level, which the menu shows once it is back
+        if self.library:
+            self.moves = self.b.state.get_moves()
+            self.library.record_score(self.level_file, self.number, len(self.moves),
+                                      sum(1 for move in self.moves if move.isupper()))
 
-        self.game_mainloop()
-
-    def parse_level_data(self, level_file):
-        with open(f'./levels/{level_file}') as file:
-            return json.load(file)
-
-    def game_mainloop(self):
+    def draw(self):
+        # Let the player know once a box is stuck where it can never reach a goal
+        if self.b.state.is_lost() != self.shown_lost:
+            self.shown_lost = self.b.state.is_lost()
+            if self.shown_lost:
+                pg.display.set_caption(f'{self.name} (stuck, undo or restart)')
+            else:
+                pg.display.set_caption(self.name)
+        if self.redraw_all:
+            self.draw_all()
+        else:
+            self.draw_dirty()
 
-        '''
-        As this is a turn-based game, there is no need to update all sprites every frame
-        Updates to variables should only happen after a valid move is made
-        '''
+    def draw_all(self):
+        self.b.draw()
+        self.screen.fill(SCREEN_COLOUR)
+        self.screen.blit(self.b, BOARD_OFFSET)
+        # Draw game screen buttons
+        self.game_buttons_group.draw(self.screen)
+        pg.display.flip()
+        self.redraw_all = False
+
+    def draw_dirty(self):
+        self.dirty_rects = []
+        for rect in self.b.draw_dirty():
+            self.screen_rect = rect.move(BOARD_OFFSET)
+            self.screen.blit(self.b, self.screen_rect, rect)
+            self.dirty_rects.append(self.screen_rect)
+        if self.dirty_rects:
+            pg.display.update(self.dirty_rects)
+
+
+class LoadingScene(Scene):
+
+    '''
+    Shown between choosing a level and playing it, while the level is read, checked and its board prepared
+    The work is done on a worker thread, so the window keeps painting and answering while a large level loads
+    Once the board is ready, this scene is replaced by the game, which plays on the board prepared here
+    A level that cannot be played is reported here, and any key or click goes back to the menu
+    '''
+
+    stages = ('Loading level', 'Checking level', 'Preparing board')
+
+    def __init__(self, manager, level_file, number, name, library=None):
+        super().__init__(manager)
+        self.level_file = level_file
+        self.number = number
+        self.name = name
+        self.library = library
+        self.caption = f'{name} (loading)'
+        self.font = pg.font.Font(None, 36)
+        self.frame = 0
+        # Written by the worker and read on the main thread once it has posted that it is done
+        self.stage = 0
+        self.board = None
+        self.error = None
+
+        self.thread = threading.Thread(target=self.work, args=(get_board_dims(self.screen.get_size()),), daemon=True)
+        self.thread.start()
+
+    def is_done(self):
+        return self.stage == len(self.stages)
+
+    def set_stage(self, stage):
+        self.stage = stage
+        try:
+            pg.event.post(pg.event.Event(LEVEL_LOADING, stage=stage))
+        except pg.error:
+            # The display has been closed, so there is no scene left to wake
+            pass
+
+    def work(self, board_dims):
+        try:
+            level = load_library_level(self.level_file, self.number)
+            self.set_stage(1)
+            # Void stops the player in play, so only rules that make the level unwinnable stop it being played
+            check_level(level, closed=False)
+            self.set_stage(2)
+            # The board scales its images and draws its background here, not on the main thread
+            self.board = Board(level, board_dims)
+        except Exception as error:
+            # Whatever went wrong is shown on the loading screen, rather than leaving it waiting for ever
+            self.error = str(error) or type(error).__name__
+        finally:
+            self.set_stage(len(self.stages))
+
+    def enter(self):
+        super().enter()
+        # The progress bar sweeps while the worker runs, so the loop ticks instead of waiting for input
+        self.manager.scheduler.set_animating(not self.is_done())
+
+    def leave(self):
+        self.manager.scheduler.set_animating(False)
+
+    def handle_event(self, event):
+        super().handle_event(event)
+        if event.type == LEVEL_LOADING and self.is_done():
+            self.manager.scheduler.set_animating(False)
+            if self.board is not None:
+                self.manager.replace(Game(self.manager, self.board, self.level_file, self.number, self.name,
+                                          self.library))
+            else:
+                pg.display.set_caption(f'{self.name} (could not be played)')
+        elif event.type in (pg.KEYDOWN, pg.MOUSEBUTTONDOWN):
+            # Escape gives up waiting, once an error is shown anything goes back to the menu
+            if self.error is not None or (event.type == pg.KEYDOWN and event.key == pg.K_ESCAPE):
+                self.manager.pop()
 
-        while not self.done:
+    def draw(self):
+        self.frame += 1
+        self.screen.fill(SCREEN_COLOUR)
+        centre = self.screen.get_rect().center
+        bar = pg.Rect(0, 0, *LOADING_BAR_DIMS)
+        bar.center = centre
+        if self.error is not None:
+            for position, line in enumerate((f'{self.name} cannot be played:', self.error, 'Press any key to go back')):
+                self.blit_text(line, (centre[0], centre[1] + (position - 1) * 40))
+        else:
+            # Finished stages fill the bar, a block sweeping along the rest shows the current one is still going
+            done = bar.w * self.stage // len(self.stages)
+            pg.draw.rect(self.screen, TILE_COLOUR, (bar.x, bar.y, done, bar.h))
+            sweep_x = bar.x + done + (self.frame * 8) % max(1, bar.w - done)
+            pg.draw.rect(self.screen, GTILE_COLOUR, pg.Rect(sweep_x, bar.y, LOADING_SWEEP_WIDTH, bar.h).clip(bar))
+            pg.draw.rect(self.screen, BLACK, bar, 2)
+            self.blit_text(f'{self.stages[min(self.stage, len(self.stages) - 1)]}...', (centre[0], bar.y - 30))
+            self.blit_text(self.name, (centre[0], bar.bottom + 30))
+        pg.display.flip()
 
-            pg.display.flip()
+    def blit_text(self, text, centre):
+        image = self.font.render(text, True, BLACK)
+        self.screen.blit(image, image.get_rect(center=centre))
 
-            self.clock.tick(FPS)
 
-            for event in pg.event.get():
-                if event.type == pg.QUIT:
-                    self.done = True
-                if event.type == pg.KEYDOWN:
-                    self.done = self.b.events(event.__dict__['key'])
-                if event.type == pg.MOUSEBUTTONDOWN:
-                    if event.button == 1:
-                        self.mouse_point = event.pos
-                        if self.undo_b.rect.collidepoint(self.mouse_point):
-                            self.b.undo()
-                        if self.restart_b.rect.collidepoint(self.mouse_point):
-                            self.b = Board(self.level_data)
-                        if self.quit_b.rect.collidepoint(self.mouse_point):
-                            self.done = True
+class Board(pg.Surface):
 
-            self.screen.blit(self.b, BOARD_OFFSET)
+    '''
+    The rules of the game live in the game core, the board only draws the state the core is in
+    Boxes and the player are drawn straight from the core's cells, one scaled image each shared by every box
+    After a move or undo, the cells the player and a pushed box left and entered are marked dirty,
+    and only those cells are drawn again
 
-            # Draw game screen buttons
-            self.game_buttons_group.draw(self.screen)
+    Tiles, goal tiles and walls never move during play, so they are drawn once into a background surface
+    Drawing the board is then one blit of the background with the player and boxes on top
 
-            #pg.display.flip()
+    Levels too large to fit at MIN_TILE_SIZE are shown through a viewport, a camera that follows the player
+    Only the cells inside the viewport are ever drawn, and the background only covers the viewport,
+    so drawing and memory depend on the size of the board on screen, not the size of the level
 
+    Moves only change the state and mark cells dirty, nothing is drawn until the board is next drawn
+    Any number of moves between two frames then costs one draw, with each changed cell drawn once
 
-class Board(pg.Surface):
+    When the window is resized, the board is laid out again at the new size without touching the game state
+    '''
 
-    def __init__(self, level_data):
-        super().__init__((BOARDW, BOARDH))
+    def __init__(self, level, size=(BOARDW, BOARDH)):
+        super().__init__(size)
 
         # Possibly add a feature that adds void tiles and aligns the level so tile dims are consistent?
         # This feature may be a part of level creation
         # After a level is created, the game my add void blocks around the level to keep tile sizes square looking
 
-        self.map = level_data['map']
-
-        # Coordinates for interactive items (column, row (top to bottom))
-        self.player_coords = level_data['player_coords']
-        self.box_coords = level_data['box_coords']
+        self.level = level
+        self.state = GameState(self.level)
 
-        self.boxes = []
-        self.gtiles = []
+        self.set_layout(size)
+        # Top left cell of the viewport, levels that fit on the board never move it
+        self.camera = (0, 0)
+        self.camera_moved = False
 
-        self.history = []
-        self.history_offset = 1
+        # Cells that have changed since they were last drawn
+        self.dirty = set()
+        self.load_images()
 
-        self.tileh = math.ceil(BOARDH/len(self.map))
-        self.tilew = math.ceil(BOARDW/len(self.map[0]))
+        self.background = pg.Surface(size)
+        self.follow_player()
+        self.render_background()
 
-        # Initialize sprite groups
-        self.tile_group = pg.sprite.Group()
-        self.gtile_group = pg.sprite.Group()
-        self.wall_group = pg.sprite.Group()
-        self.box_group = pg.sprite.Group()
-        self.player_group = pg.sprite.Group()
-
-        # Initialize objects
-        self.p = None
-        self.place_objects()
+        self.draw()
 
+    def set_layout(self, size):
+        boardw, boardh = size
+        self.tileh = max(math.ceil(boardh/self.level.rows), MIN_TILE_SIZE)
+        self.tilew = max(math.ceil(boardw/self.level.cols), MIN_TILE_SIZE)
+
+        # Cells that fit whole on the board, and the cells drawn including any cut off at the edge
+        # A level that fits at MIN_TILE_SIZE is shown whole, even though its rounded up tiles overhang the board
+        self.view_cols, self.draw_cols = self.get_view(boardw, self.tilew, self.level.cols)
+        self.view_rows, self.draw_rows = self.get_view(boardh, self.tileh, self.level.rows)
+
+    def get_view(self, board, tile, cells):
+        if cells * MIN_TILE_SIZE <= board:
+            return cells, cells
+        return max(1, min(int(board // tile), cells)), min(math.ceil(board / tile), cells)
+
+    def resize(self, size):
+        # A Surface cannot change size, so the board's own Surface is made again, everything else is kept
+        pg.Surface.__init__(self, size)
+        self.background = pg.Surface(size)
+        self.set_layout(size)
+        self.load_images()
+        self.follow_player()
+        self.render_background()
         self.draw()
 
-    def place_objects(self):
-        # Responsible for laying the initial board
-        self.p = Player(self.player_coords[0] * self.tilew, self.player_coords[1] * self.tileh, self.tilew, self.tileh)
-        self.player_group.add(self.p)
-        for box_coord in self.box_coords:
-            self.b = Box(box_coord[0] * self.tilew, box_coord[1] * self.tileh, self.tilew, self.tileh)
-            self.box_group.add(self.b)
-            self.boxes.append(self.b)
-        for row in range(0, len(self.map)):
-            for col in range(0, len(self.map[row])):
-                item = self.map[row][col]
-                if item == '.':
-                    self.tile_group.add(Tile(col * self.tilew, row * self.tileh, self.tilew, self.tileh))
-                elif item == '#':
-                    self.wall_group.add(Wall(col * self.tilew, row * self.tileh, self.tilew, self.tileh))
-                elif item == 'x':
-                    self.g = GTile(col * self.tilew, row * self.tileh, self.tilew, self.tileh)
-                    self.gtile_group.add(self.g)
-                    self.gtiles.append(self.g)
-        # Update box moves first, as the player needs them to decide their valid moves
-        for box in self.boxes:
-            box.update_valid_moves(self.wall_group, self.box_group)
-        self.p.update_valid_moves(self.wall_group, self.box_group)
+    def load_images(self):
+        # Scaled images come from the asset cache, so sizes that have been used before are not scaled again
+        self.player_image = get_sprite(PLAYER_SPRITE, self.tilew, self.tileh)
+        self.box_image = get_sprite(BOX_SPRITE, self.tilew, self.tileh)
+
+    def follow_player(self):
+        # Scrolls the viewport just far enough to keep the player CAMERA_MARGIN cells from its edge
+        col, row = self.state.get_player_coords()
+        self.camera = (self.follow_axis(col, self.camera[0], self.view_cols, self.level.cols),
+                       self.follow_axis(row, self.camera[1], self.view_rows, self.level.rows))
+
+    def follow_axis(self, pos, camera, view, size):
+        margin = min(CAMERA_MARGIN, (view - 1) // 2)
+        camera = min(camera, pos - margin)
+        camera = max(camera, pos + margin - view + 1)
+        return max(0, min(camera, size - view))
+
+    def update_camera(self):
+        self.old_camera = self.camera
+        self.follow_player()
+        if self.camera != self.old_camera:
+            # Everything on the board has moved, so it is all drawn again on the next draw_dirty
+            self.render_background()
+            self.camera_moved = True
+
+    def get_visible_cells(self):
+        for row in range(self.camera[1], self.camera[1] + self.draw_rows):
+            for col in range(self.camera[0], self.camera[0] + self.draw_cols):
+                yield col, row
+
+    def get_cell_rect(self, col, row):
+        return pg.Rect((col - self.camera[0]) * self.tilew, (row - self.camera[1]) * self.tileh, self.tilew, self.tileh)
+
+    def render_background(self):
+        # Only needs doing again when the level is loaded, the tile size changes or the viewport scrolls
+        self.background.fill(BLACK)
+        for col, row in self.get_visible_cells():
+            item = self.level.get_cell(col, row)
+            if item in CELL_IMAGES:
+                self.background.blit(get_sprite(CELL_IMAGES[item], self.tilew, self.tileh),
+                                     self.get_cell_rect(col, row))
+
+    def mark_moved(self, result, far_cell):
+        # The player's old and new cells always change, a push or pull also changes the box's cell furthest along
+        self.dirty.update((self.old_player, self.state.player))
+        if result == PUSHED:
+            self.dirty.add(far_cell)
 
     def undo(self):
-        '''
-        If the previous move was valid, then the reverse of that move will be valid
-        This means no extra positional checks are needed to undo a move
-        '''
-        # Cannot undo if there are no more moves left to undo
-        if self.history_offset > len(self.history):
-            return
-        # Calculate the reverse of the move the player made
-        self.prev_move = self.history[-self.history_offset][0]
-        self.rev_move = tuple(map(lambda x: x*-1, self.prev_move))
-        # The player must have their move undone first before the box can move
-        self.p.undo(self.p.get_key(self.rev_move))
-        if self.history[-self.history_offset][1]:
-            self.history[-self.history_offset][1].undo(self.p.get_key(self.rev_move))
-            for box in self.boxes:
-                    box.update_valid_moves(self.wall_group, self.box_group)
-        self.p.update_valid_moves(self.wall_group, self.box_group)
-        # Allows rewinding multiple moves
-        self.history_offset += 1
-        self.draw()
+        self.old_player = self.state.player
+        # The box comes back from beyond the cell the player was standing in
+        self.mark_moved(self.state.undo(), 2 * self.old_player - self.state.player)
+
+    def redo(self):
+        self.old_player = self.state.player
+        self.mark_moved(self.state.redo(), 2 * self.state.player - self.old_player)
 
     def draw(self):
-        self.tile_group.draw(self)
-        self.gtile_group.draw(self)
-        self.wall_group.draw(self)
-        self.player_group.draw(self)
-        self.box_group.draw(self)
+        # Cover the whole board with the background and draw the boxes and player in view on top
+        self.update_camera()
+        self.blit(self.background, (0, 0))
+        for col, row in self.get_visible_cells():
+            if self.state.boxes[self.level.index(col, row)]:
+                self.blit(self.box_image, self.get_cell_rect(col, row))
+        self.blit(self.player_image, self.get_cell_rect(*self.state.get_player_coords()))
+        self.dirty = set()
+        self.camera_moved = False
+
+    def draw_cell(self, cell):
+        self.cell_rect = self.get_cell_rect(*self.level.coords(cell))
+        self.blit(self.background, self.cell_rect, self.cell_rect)
+        if cell == self.state.player:
+            self.blit(self.player_image, self.cell_rect)
+        if self.state.boxes[cell]:
+            self.blit(self.box_image, self.cell_rect)
+        return self.cell_rect
+
+    def draw_dirty(self):
+        # Draws only the cells that have changed, returning the areas of the board that were drawn over
+        # The viewport only follows the player here, so a batch of moves scrolls and redraws it once
+        self.update_camera()
+        if self.camera_moved:
+            self.draw()
+            return [self.get_rect()]
+        # Cells outside the viewport are clipped away, so the areas returned are kept inside the board
+        self.drawn = [self.draw_cell(cell).clip(self.get_rect()) for cell in self.dirty]
+        self.dirty = set()
+        return [rect for rect in self.drawn if rect]
 
     def events(self, key):
-        # Wipe the screen
-        self.fill(BLACK)
-        # Only need to update variables if the move was valid
-        if key in self.p.get_valid_moves().keys():
-            self.history = self.history[0:len(self.history) - (self.history_offset - 1)]
-            self.history.append(self.p.move(key))
-            self.history_offset = 1
-            for box in self.boxes:
-                box.update_valid_moves(self.wall_group, self.box_group)
-            # Update the players valid moves first at it relies on the boxes valid moves
-            self.p.update_valid_moves(self.wall_group, self.box_group)
-        self.draw()
-        # To check for a win, loop through every goal tile to check if a box is on top of it
-        for gtile in self.gtiles:
-            if not gtile.check_filled(self.box_group):
-                return False
-        return True
+        if key in KEY_DIRECTIONS:
+            self.old_player = self.state.player
+            # The pushed box moves one cell further in the direction the player moved
+            self.mark_moved(self.state.move(KEY_DIRECTIONS[key]), 2 * self.state.player - self.old_player)
+        # The game core keeps count of the covered goals, so checking for a win is a single comparison
+        return self.state.is_won()
 
 
 class GameSprite(pg.sprite.Sprite):
@@ -420,129 +751,13 @@ class GameSprite(pg.sprite.Sprite):
         if sprite is None:
             self.image = pg.Surface((w, h))
         else:
-            self.image = pg.image.load(f'images/{sprite}').convert()
+            self.image = ASSETS.get_image(sprite)
         self.rect = self.image.get_rect()
         self.rect.x = x
         self.rect.y = y
 
 
-class EditSpace(GameSprite):
-
-    def __init__(self, x, y, w, h):
-        super().__init__(x, y, w, h)
-        self.image.fill(BLACK)
-        self.rect.center = (x, y)
-
-
-class Moving(GameSprite):
-
-    def __init__(self, x, y, w, h):
-        super().__init__(x, y, w, h)
-        self.movement_vectors = {pg.K_UP: (0, -1), pg.K_DOWN: (0, 1), pg.K_LEFT: (-1, 0), pg.K_RIGHT: (1, 0)}
-        self.valid_moves = {}
-        self.w = w
-        self.h = h
-
-    def get_key(self, vect):
-        self.val_index = list(self.movement_vectors.values()).index(vect)
-        return list(self.movement_vectors.keys())[self.val_index]
-
-    def get_new_pos(self, key):
-        self.newposx = self.rect.x + self.movement_vectors[key][0] * self.w
-        self.newposy = self.rect.y + self.movement_vectors[key][1] * self.h
-        return self.newposx, self.newposy
-
-    def get_valid_moves(self):
-        return self.valid_moves
-
-    def update_valid_moves(self, walls, boxes):
-        self.valid_moves = {}
-        for key in self.movement_vectors.keys():
-            self.valid = True
-            self.box_pushed = None
-            self.newposx, self.newposy = self.get_new_pos(key)
-            for wall in walls:
-                if self.newposx == wall.rect.x and self.newposy == wall.rect.y:
-                    self.valid = False
-                    break
-            for box in boxes:
-                # There will only ever be one box with the same x and y as new pos
-                # Once this box is found, carry out a check and ignore the rest
-                if self.newposx == box.rect.x and self.newposy == box.rect.y:
-                    self.valid, self.box_pushed = self.assess_box_collision(key, box)
-                    break
-            # TODO This does not keep the player in the board bounds, fix this
-            if BOARDW <= self.newposx <= 0 or BOARDH <= self.newposy <= 0:
-                self.valid = False
-            if self.valid:
-                self.valid_moves.update({key: self.box_pushed})
-
-    def move(self, key):
-        if self.valid_moves[key]:
-            self.valid_moves[key].move(key)
-        self.rect.x += self.movement_vectors[key][0] * self.w
-        self.rect.y += self.movement_vectors[key][1] * self.h
-        return self.movement_vectors[key], self.valid_moves[key]
-
-    def undo(self, key):
-        self.rect.x += self.movement_vectors[key][0] * self.w
-        self.rect.y += self.movement_vectors[key][1] * self.h
-
-    def assess_box_collision(self, key, box):
-        return False, None
-
-
-class Player(Moving):
-
-    def __init__(self, x, y, w, h):
-        super().__init__(x, y, w, h)
-        #self.image.fill(PLAYER_COLOUR)
-        self.image = pg.transform.scale(pg.image.load('./images/player.png'), (w, h))
-
-    def assess_box_collision(self, key, box):
-        if key not in box.get_valid_moves():
-            return False, None
-        else:
-            return True, box
-
-
-class Box(Moving):
-
-    def __init__(self, x, y, w, h):
-        super().__init__(x, y, w, h)
-        #self.image.fill(BOX_COLOUR)
-        self.image = pg.transform.scale(pg.image.load('./images/box.png'), (w, h))
-
-
-class Wall(GameSprite):
-
-    def __init__(self, x, y, w, h):
-        super().__init__(x, y, w, h)
-        #self.image.fill(WALL_COLOUR)
-        self.image = pg.transform.scale(pg.image.load('./images/wall.png'), (w, h))
-
-
-class Tile(GameSprite):
-
-    def __init__(self, x, y, w, h):
-        super().__init__(x, y, w, h)
-        #self.image.fill(TILE_COLOUR)
-        self.image = pg.transform.scale(pg.image.load('./images/tile.png'), (w, h))
-
-
-class GTile(Tile):
-
-    def __init__(self, x, y, w, h):
-        super().__init__(x, y, w, h)
-        self.image.fill(GTILE_COLOUR)
-        self.image = pg.transform.scale(pg.image.load('./images/goal_tile.png'), (w, h))
-
-    def check_filled(self, boxes):
-        for box in boxes:
-            if box.rect.x == self.rect.x and box.rect.y == self.rect.y:
-                return True
-        return False
-
-
 if __name__ == '__main__':
-    game = MainMenu()
+    manager = SceneManager(SCREEN_DIMS, WINDOW_FLAGS, FPS)
+    manager.push(MainMenu(manager))
+    manager.run()